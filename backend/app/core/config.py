@@ -14,6 +14,14 @@ class Settings:
     DB_PORT: str = os.getenv("DB_PORT")
     DB_NAME: str = os.getenv("DB_NAME")
     DATABASE_URL: str = f"mysql+pymysql://{DB_USER}:{DB_PASSWORD}@{DB_HOST}:{DB_PORT}/{DB_NAME}"
+    # Driver async untuk route scan (AsyncSession)
+    ASYNC_DATABASE_URL: str = f"mysql+aiomysql://{DB_USER}:{DB_PASSWORD}@{DB_HOST}:{DB_PORT}/{DB_NAME}"
+    DB_POOL_SIZE: int = int(os.getenv("DB_POOL_SIZE", 10))
+    DB_MAX_OVERFLOW: int = int(os.getenv("DB_MAX_OVERFLOW", 20))
+    DB_POOL_TIMEOUT: float = float(os.getenv("DB_POOL_TIMEOUT", 10))
+    DB_POOL_RECYCLE: int = int(os.getenv("DB_POOL_RECYCLE", 1800))
+    DB_POOL_PRE_PING: bool = os.getenv("DB_POOL_PRE_PING", "True").lower() == "true"
+    DB_TIME_ZONE: str = os.getenv("DB_TIME_ZONE", "+07:00")
     
     # Security
     SECRET_KEY: str = os.getenv("SECRET_KEY")
@@ -22,15 +30,68 @@ class Settings:
     
     # External Services
     GEMINI_API_KEY: str = os.getenv("GEMINI_API_KEY")
+    GEMINI_KEY_COOLDOWN: int = int(os.getenv("GEMINI_KEY_COOLDOWN", 60))
+    GEMINI_KEY_MAX_COOLDOWN: int = int(os.getenv("GEMINI_KEY_MAX_COOLDOWN", 900))
+    GEMINI_MAX_CONCURRENCY: int = int(os.getenv("GEMINI_MAX_CONCURRENCY", 16))
+    GEMINI_QUEUE_TIMEOUT: float = float(os.getenv("GEMINI_QUEUE_TIMEOUT", 30))
+    GEMINI_STRUCTURED_OUTPUT: bool = os.getenv("GEMINI_STRUCTURED_OUTPUT", "true").lower() == "true"
+
+    # AI Analysis Cache
+    ANALYSIS_CACHE_DAYS: int = int(os.getenv("ANALYSIS_CACHE_DAYS", 30))
+    ANALYSIS_MEMORY_CACHE_SIZE: int = int(os.getenv("ANALYSIS_MEMORY_CACHE_SIZE", 512))
+    ANALYSIS_CACHE_PERCEPTUAL: bool = os.getenv("ANALYSIS_CACHE_PERCEPTUAL", "False").lower() == "true"
+    CHAT_CACHE_TTL: int = int(os.getenv("CHAT_CACHE_TTL", 86400))
+    CHAT_MEMORY_CACHE_SIZE: int = int(os.getenv("CHAT_MEMORY_CACHE_SIZE", 1024))
+    CHAT_CACHE_DB_ENABLED: bool = os.getenv("CHAT_CACHE_DB_ENABLED", "False").lower() == "true"
+    CHAT_CACHE_DAYS: int = int(os.getenv("CHAT_CACHE_DAYS", 7))
     RECAPTCHA_SECRET_KEY: str = os.getenv("RECAPTCHA_SECRET_KEY")
     
     # App Settings
     UPLOAD_DIR: str = os.getenv("UPLOAD_DIR", "./uploads")
     MAX_UPLOAD_SIZE: int = int(os.getenv("MAX_UPLOAD_SIZE", 10485760))
+
+    # Image Preprocessing (sebelum AI/OCR)
+    IMAGE_PIPELINE_WORKERS: int = int(os.getenv("IMAGE_PIPELINE_WORKERS", 4))
+    IMAGE_MAX_EDGE: int = int(os.getenv("IMAGE_MAX_EDGE", 1600))
+    IMAGE_OCR_MAX_EDGE: int = int(os.getenv("IMAGE_OCR_MAX_EDGE", 2400))
+    IMAGE_JPEG_QUALITY: int = int(os.getenv("IMAGE_JPEG_QUALITY", 85))
+    IMAGE_GRAYSCALE: bool = os.getenv("IMAGE_GRAYSCALE", "True").lower() == "true"
+    IMAGE_AUTO_CROP: bool = os.getenv("IMAGE_AUTO_CROP", "True").lower() == "true"
+    OCR_WORKERS: int = int(os.getenv("OCR_WORKERS", 2))
+    OCR_QUEUE_SIZE: int = int(os.getenv("OCR_QUEUE_SIZE", 8))
+    OCR_JOB_TIMEOUT: int = int(os.getenv("OCR_JOB_TIMEOUT", 20))
+    OCR_FAST_PATH: bool = os.getenv("OCR_FAST_PATH", "True").lower() == "true"
+    OCR_FAST_PATH_MIN_CONFIDENCE: float = float(os.getenv("OCR_FAST_PATH_MIN_CONFIDENCE", 0.8))
     DEBUG: bool = os.getenv("DEBUG", "False").lower() == "true"
     HOST: str = os.getenv("HOST", "0.0.0.0")
     PORT: int = int(os.getenv("PORT", 8000))
 
+    # BPOM Cache
+    BPOM_CACHE_DAYS: int = int(os.getenv("BPOM_CACHE_DAYS", 30))
+    BPOM_MEMORY_CACHE_SIZE: int = int(os.getenv("BPOM_MEMORY_CACHE_SIZE", 2048))
+    BPOM_MEMORY_CACHE_TTL: int = int(os.getenv("BPOM_MEMORY_CACHE_TTL", 3600))
+    BPOM_NEGATIVE_CACHE_HOURS: int = int(os.getenv("BPOM_NEGATIVE_CACHE_HOURS", 24))
+
+    # BPOM Scraper
+    BPOM_TIMEOUT: float = float(os.getenv("BPOM_TIMEOUT", 45))
+    BPOM_MAX_CONNECTIONS: int = int(os.getenv("BPOM_MAX_CONNECTIONS", 20))
+    BPOM_HTTP2: bool = os.getenv("BPOM_HTTP2", "False").lower() == "true"
+    BPOM_CSRF_TTL: int = int(os.getenv("BPOM_CSRF_TTL", 1800))
+    BPOM_PARALLEL_VARIANTS: bool = os.getenv("BPOM_PARALLEL_VARIANTS", "True").lower() == "true"
+    BPOM_SEARCH_DEADLINE: float = float(os.getenv("BPOM_SEARCH_DEADLINE", 20))
+    BPOM_BATCH_MAX_ITEMS: int = int(os.getenv("BPOM_BATCH_MAX_ITEMS", 500))
+    BPOM_BATCH_CONCURRENCY: int = int(os.getenv("BPOM_BATCH_CONCURRENCY", 4))
+
+    # BPOM Cache Refresher
+    BPOM_STALE_WHILE_REVALIDATE: bool = os.getenv("BPOM_STALE_WHILE_REVALIDATE", "True").lower() == "true"
+    BPOM_MAX_STALE_DAYS: int = int(os.getenv("BPOM_MAX_STALE_DAYS", 7))
+    BPOM_REFRESHER_ENABLED: bool = os.getenv("BPOM_REFRESHER_ENABLED", "True").lower() == "true"
+    BPOM_REFRESH_INTERVAL: int = int(os.getenv("BPOM_REFRESH_INTERVAL", 3600))
+    BPOM_REFRESH_WINDOW_DAYS: int = int(os.getenv("BPOM_REFRESH_WINDOW_DAYS", 3))
+    BPOM_REFRESH_BATCH: int = int(os.getenv("BPOM_REFRESH_BATCH", 50))
+    BPOM_REFRESH_CONCURRENCY: int = int(os.getenv("BPOM_REFRESH_CONCURRENCY", 2))
+    BPOM_REFRESH_RATE: float = float(os.getenv("BPOM_REFRESH_RATE", 0.5))
+
     # --- CORS & FRONTEND URL CONFIG ---
     CORS_ORIGINS: str = os.getenv("CORS_ORIGINS", "*")
 
@@ -1,26 +1,95 @@
-from sqlalchemy import create_engine, event
+import threading
+import time
+from sqlalchemy import create_engine, exc
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import AsyncAdaptedQueuePool, QueuePool
 from app.core.config import settings
 
-engine = create_engine(
-    settings.DATABASE_URL,
-    pool_pre_ping=True,
-    pool_recycle=3600,
-)
+class _TimedPoolMixin:
+    """Catat lama menunggu koneksi (checkout) dan jumlah timeout pool."""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._metrics_lock = threading.Lock()
+        self.checkouts = 0
+        self.timeouts = 0
+        self.wait_total = 0.0
+        self.wait_max = 0.0
+
+    def _do_get(self):
+        started = time.perf_counter()
+        try:
+            return super()._do_get()
+        except exc.TimeoutError:
+            with self._metrics_lock:
+                self.timeouts += 1
+            raise
+        finally:
+            waited = time.perf_counter() - started
+            with self._metrics_lock:
+                self.checkouts += 1
+                self.wait_total += waited
+                self.wait_max = max(self.wait_max, waited)
+
+    def stats(self) -> dict:
+        with self._metrics_lock:
+            return {
+                "size": self.size(),
+                "in_use": self.checkedout(),
+                "idle": self.checkedin(),
+                # overflow() bernilai negatif selama pool inti belum penuh
+                "overflow": max(self.overflow(), 0),
+                "max_overflow": self._max_overflow,
+                "checkouts": self.checkouts,
+                "timeouts": self.timeouts,
+                "wait_avg_ms": round(self.wait_total / self.checkouts * 1000, 3) if self.checkouts else 0.0,
+                "wait_max_ms": round(self.wait_max * 1000, 3),
+            }
+
+class TimedQueuePool(_TimedPoolMixin, QueuePool):
+    pass
+
+class TimedAsyncQueuePool(_TimedPoolMixin, AsyncAdaptedQueuePool):
+    pass
 
-@event.listens_for(engine, "connect")
-def set_timezone(dbapi_conn, connection_record):
-    cursor = dbapi_conn.cursor()
-    cursor.execute("SET time_zone = '+07:00'")
-    cursor.close()
+def _pool_options() -> dict:
+    return {
+        "pool_size": settings.DB_POOL_SIZE,
+        "max_overflow": settings.DB_MAX_OVERFLOW,
+        "pool_timeout": settings.DB_POOL_TIMEOUT,
+        "pool_recycle": settings.DB_POOL_RECYCLE,
+        "pool_pre_ping": settings.DB_POOL_PRE_PING,
+        # Zona waktu diset saat handshake, bukan query tambahan per koneksi
+        "connect_args": {"init_command": f"SET time_zone = '{settings.DB_TIME_ZONE}'"},
+    }
+
+engine = create_engine(settings.DATABASE_URL, poolclass=TimedQueuePool, **_pool_options())
+
+# Engine async untuk route scan: query tidak memblokir event loop
+async_engine = create_async_engine(
+    settings.ASYNC_DATABASE_URL, poolclass=TimedAsyncQueuePool, **_pool_options()
+)
 
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+# expire_on_commit=False: atribut tetap bisa dibaca setelah commit tanpa lazy load (tidak didukung async)
+AsyncSessionLocal = async_sessionmaker(async_engine, autoflush=False, expire_on_commit=False)
 Base = declarative_base()
 
+def get_pool_stats() -> dict:
+    return {
+        "sync": engine.pool.stats(),
+        "async": async_engine.pool.stats(),
+    }
+
 def get_db():
     db = SessionLocal()
     try:
         yield db
     finally:
-        db.close()
\ No newline at end of file
+        db.close()
+
+async def get_async_db():
+    async with AsyncSessionLocal() as db:
+        yield db
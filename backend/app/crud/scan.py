@@ -1,45 +1,383 @@
-from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import delete, func, select
+from sqlalchemy.dialects.mysql import insert as mysql_insert
 from datetime import datetime, date, time, timedelta
-from app.models.scan import ScanHistoryBPOM, ScanHistoryOCR, BPOMCache
-
-def get_bpom_cache(db: Session, bpom_number: str):
-    cache = db.query(BPOMCache).filter(BPOMCache.bpom_number == bpom_number).first()
-    if cache:
-        expiry_date = cache.last_updated + timedelta(days=30)
-        if datetime.now() < expiry_date:
-            return cache.data
-    return None
-
-def create_bpom_cache(db: Session, bpom_number: str, data: dict):
-    existing = db.query(BPOMCache).filter(BPOMCache.bpom_number == bpom_number).first()
+from typing import Dict, List, Optional, Set, Tuple
+import copy
+from app.models.scan import ScanHistoryBPOM, ScanHistoryOCR, BPOMCache, BPOMNegativeCache, BPOMRegistry, AnalysisCache, ChatAnswerCache
+from app.core.cache import TTLCache
+from app.core.database import AsyncSessionLocal
+from app.core.config import settings
+from app.services.bpom_endpoint import normalize_bpom_number, get_bpom_number_variants
+from app.services.analysis_cache import perceptual_stats
+
+# Tier in-process di depan tabel bpom_cache, per worker
+bpom_memory_cache = TTLCache(
+    maxsize=settings.BPOM_MEMORY_CACHE_SIZE,
+    ttl=settings.BPOM_MEMORY_CACHE_TTL
+)
+# Nomor yang dijawab "tidak ditemukan" oleh cekbpom
+bpom_negative_memory_cache = TTLCache(
+    maxsize=settings.BPOM_MEMORY_CACHE_SIZE,
+    ttl=settings.BPOM_MEMORY_CACHE_TTL
+)
+# Hasil analisis AI per gambar label
+analysis_memory_cache = TTLCache(
+    maxsize=settings.ANALYSIS_MEMORY_CACHE_SIZE,
+    ttl=settings.ANALYSIS_CACHE_DAYS * 86400
+)
+# Jawaban chat per (konteks produk, pertanyaan, bahasa)
+chat_memory_cache = TTLCache(
+    maxsize=settings.CHAT_MEMORY_CACHE_SIZE,
+    ttl=settings.CHAT_CACHE_TTL
+)
+
+async def get_bpom_cache_entry(db: AsyncSession, bpom_number: str) -> Tuple[Optional[dict], bool]:
+    """Mengembalikan (data, is_stale). Data kedaluwarsa tetap dikembalikan untuk stale-while-revalidate."""
+    key = normalize_bpom_number(bpom_number)
+    cached = bpom_memory_cache.get(key)
+    if cached is not None:
+        return dict(cached), False
+
+    cache = (await db.execute(select(BPOMCache).where(BPOMCache.bpom_number == key))).scalars().first()
+    if cache and not _beyond_max_stale(cache.last_updated):
+        expiry_date = cache.last_updated + timedelta(days=settings.BPOM_CACHE_DAYS)
+        remaining = (expiry_date - datetime.now()).total_seconds()
+        if remaining > 0:
+            bpom_memory_cache.set(key, dict(cache.data), ttl=remaining)
+            return cache.data, False
+        return cache.data, True
+    return None, False
+
+def _beyond_max_stale(last_updated: datetime) -> bool:
+    """Data yang gagal di-refresh terlalu lama tidak disajikan lagi (izin bisa sudah dicabut)."""
+    max_age = timedelta(days=settings.BPOM_CACHE_DAYS + settings.BPOM_MAX_STALE_DAYS)
+    return last_updated + max_age <= datetime.now()
+
+async def get_bpom_cache(db: AsyncSession, bpom_number: str):
+    data, is_stale = await get_bpom_cache_entry(db, bpom_number)
+    return None if is_stale else data
+
+async def get_bpom_cache_bulk(db: AsyncSession, bpom_numbers: List[str]) -> Dict[str, Tuple[dict, bool]]:
+    """Versi batch get_bpom_cache_entry: tier memori lalu satu query IN. Kunci hasil = nomor input."""
+    found = {}
+    remaining = {}
+    for number in bpom_numbers:
+        key = normalize_bpom_number(number)
+        cached = bpom_memory_cache.get(key)
+        if cached is not None:
+            found[number] = (dict(cached), False)
+        else:
+            remaining[key] = number
+
+    if remaining:
+        rows = (await db.execute(
+            select(BPOMCache).where(BPOMCache.bpom_number.in_(list(remaining.keys())))
+        )).scalars().all()
+        now = datetime.now()
+        for row in rows:
+            number = remaining.get(row.bpom_number)
+            if number is None or _beyond_max_stale(row.last_updated):
+                continue
+            expiry_date = row.last_updated + timedelta(days=settings.BPOM_CACHE_DAYS)
+            ttl = (expiry_date - now).total_seconds()
+            if ttl > 0:
+                bpom_memory_cache.set(row.bpom_number, dict(row.data), ttl=ttl)
+            found[number] = (row.data, ttl <= 0)
+    return found
+
+async def get_bpom_negative_bulk(db: AsyncSession, bpom_numbers: List[str]) -> Set[str]:
+    negatives = set()
+    remaining = {}
+    for number in bpom_numbers:
+        key = normalize_bpom_number(number)
+        if bpom_negative_memory_cache.get(key):
+            negatives.add(number)
+        elif key:
+            remaining[key] = number
+
+    if remaining:
+        since = datetime.now() - timedelta(hours=settings.BPOM_NEGATIVE_CACHE_HOURS)
+        rows = (await db.execute(select(BPOMNegativeCache.bpom_number).where(
+            BPOMNegativeCache.bpom_number.in_(list(remaining.keys())),
+            BPOMNegativeCache.last_checked > since
+        ))).all()
+        for row in rows:
+            number = remaining.get(row.bpom_number)
+            if number is not None:
+                negatives.add(number)
+    return negatives
+
+REGISTRY_FIELDS = (
+    "bpom_number", "product_name", "brand", "manufacturer", "address",
+    "issued_date", "expired_date", "composition", "packaging", "status", "qr_code",
+)
+
+def _registry_to_dict(entry: BPOMRegistry) -> dict:
+    return {field: getattr(entry, field) for field in REGISTRY_FIELDS}
+
+async def get_bpom_registry(db: AsyncSession, bpom_number: str) -> Optional[dict]:
+    key = normalize_bpom_number(bpom_number)
+    if not key:
+        return None
+
+    entry = (await db.execute(select(BPOMRegistry).where(BPOMRegistry.bpom_key == key))).scalars().first()
+    if not entry:
+        return None
+
+    data = _registry_to_dict(entry)
+    bpom_memory_cache.set(key, dict(data))
+    return data
+
+async def get_bpom_registry_bulk(db: AsyncSession, bpom_numbers: List[str]) -> Dict[str, dict]:
+    keys = {normalize_bpom_number(n): n for n in bpom_numbers}
+    keys.pop("", None)
+    if not keys:
+        return {}
+
+    found = {}
+    entries = (await db.execute(
+        select(BPOMRegistry).where(BPOMRegistry.bpom_key.in_(list(keys.keys())))
+    )).scalars().all()
+    for entry in entries:
+        data = _registry_to_dict(entry)
+        bpom_memory_cache.set(entry.bpom_key, dict(data))
+        found[keys[entry.bpom_key]] = data
+    return found
+
+async def get_bpom_refresh_candidates(db: AsyncSession, window_days: int, limit: int) -> List[str]:
+    """Nomor BPOM paling sering di-scan (30 hari terakhir) yang cache-nya akan/sudah kedaluwarsa."""
+    since = datetime.now() - timedelta(days=30)
+    popular = (await db.execute(
+        select(ScanHistoryBPOM.bpom_number, func.count(ScanHistoryBPOM.id).label("total"))
+        .where(ScanHistoryBPOM.created_at >= since)
+        .group_by(ScanHistoryBPOM.bpom_number)
+        .order_by(func.count(ScanHistoryBPOM.id).desc())
+        .limit(limit * 4)
+    )).all()
+    if not popular:
+        return []
+
+    rank = {}
+    for i, (number, _total) in enumerate(popular):
+        rank.setdefault(normalize_bpom_number(number), i)
+
+    threshold = datetime.now() - timedelta(days=max(settings.BPOM_CACHE_DAYS - window_days, 0))
+    rows = (await db.execute(select(BPOMCache.bpom_number).where(
+        BPOMCache.bpom_number.in_(list(rank.keys())),
+        BPOMCache.last_updated < threshold
+    ))).all()
+
+    numbers = sorted((r.bpom_number for r in rows), key=lambda n: rank[n])
+    return numbers[:limit]
+
+def get_bpom_cache_stats() -> dict:
+    return {
+        "positive": bpom_memory_cache.stats(),
+        "negative": bpom_negative_memory_cache.stats()
+    }
+
+async def get_analysis_cache(db: AsyncSession, content_hash: str, language: str, prompt_version: str) -> Optional[dict]:
+    key = ("sha", content_hash, language, prompt_version)
+    cached = analysis_memory_cache.get(key)
+    if cached is not None:
+        return copy.deepcopy(cached)
+
+    since = datetime.now() - timedelta(days=settings.ANALYSIS_CACHE_DAYS)
+    entry = (await db.execute(select(AnalysisCache).where(
+        AnalysisCache.content_hash == content_hash,
+        AnalysisCache.language == language,
+        AnalysisCache.prompt_version == prompt_version,
+        AnalysisCache.created_at >= since
+    ))).scalars().first()
+    if entry is None:
+        return None
+
+    ttl = (entry.created_at + timedelta(days=settings.ANALYSIS_CACHE_DAYS) - datetime.now()).total_seconds()
+    analysis_memory_cache.set(key, entry.result, ttl=ttl)
+    return copy.deepcopy(entry.result)
+
+async def get_analysis_cache_candidate(db: AsyncSession, phash: str, language: str, prompt_version: str) -> Optional[Tuple[str, dict]]:
+    """(content_hash, result) entri terbaru dengan phash sama. Hanya kandidat: pemanggil wajib
+    memastikan labelnya benar-benar sama sebelum memakai hasilnya."""
+    since = datetime.now() - timedelta(days=settings.ANALYSIS_CACHE_DAYS)
+    entry = (await db.execute(select(AnalysisCache).where(
+        AnalysisCache.phash == phash,
+        AnalysisCache.language == language,
+        AnalysisCache.prompt_version == prompt_version,
+        AnalysisCache.created_at >= since
+    ).order_by(AnalysisCache.created_at.desc()))).scalars().first()
+    if entry is None:
+        return None
+    return entry.content_hash, copy.deepcopy(entry.result)
+
+async def create_analysis_cache(db: AsyncSession, content_hash: str, phash: Optional[str], language: str, prompt_version: str, result: dict):
+    """Upsert atomik: dua upload identik bersamaan (mis. double-tap) tidak bentrok di
+    uq_analysis_content. Gagal menulis cache tidak boleh menggagalkan request."""
+    result = copy.deepcopy(result)
+    statement = mysql_insert(AnalysisCache).values(
+        content_hash=content_hash,
+        phash=phash,
+        language=language,
+        prompt_version=prompt_version,
+        result=result
+    )
+    statement = statement.on_duplicate_key_update(
+        result=statement.inserted.result,
+        phash=statement.inserted.phash,
+        created_at=func.now()
+    )
+    try:
+        await db.execute(statement)
+        await db.commit()
+    except Exception as e:
+        await db.rollback()
+        print(f"Failed to write analysis cache: {e}")
+        return
+
+    analysis_memory_cache.set(("sha", content_hash, language, prompt_version), result)
+
+def get_analysis_cache_stats() -> dict:
+    return dict(analysis_memory_cache.stats(), perceptual=dict(perceptual_stats))
+
+async def get_chat_cache(db: AsyncSession, cache_key: str) -> Optional[str]:
+    answer = chat_memory_cache.get(cache_key)
+    if answer is not None or not settings.CHAT_CACHE_DB_ENABLED:
+        return answer
+
+    since = datetime.now() - timedelta(days=settings.CHAT_CACHE_DAYS)
+    entry = (await db.execute(select(ChatAnswerCache).where(
+        ChatAnswerCache.cache_key == cache_key,
+        ChatAnswerCache.created_at >= since
+    ))).scalars().first()
+    if not entry:
+        return None
+
+    chat_memory_cache.set(cache_key, entry.answer)
+    return entry.answer
+
+async def create_chat_cache(db: AsyncSession, cache_key: str, language: str, answer: str):
+    """Upsert atomik: pertanyaan sama yang datang bersamaan tidak bentrok di cache_key.
+    Gagal menulis cache tidak boleh menggagalkan jawaban chat."""
+    chat_memory_cache.set(cache_key, answer)
+    if not settings.CHAT_CACHE_DB_ENABLED:
+        return
+
+    statement = mysql_insert(ChatAnswerCache).values(
+        cache_key=cache_key,
+        language=language,
+        answer=answer
+    )
+    statement = statement.on_duplicate_key_update(
+        answer=statement.inserted.answer,
+        created_at=func.now()
+    )
+    try:
+        await db.execute(statement)
+        await db.commit()
+    except Exception as e:
+        await db.rollback()
+        print(f"Failed to write chat cache: {e}")
+
+def get_chat_cache_stats() -> dict:
+    return chat_memory_cache.stats()
+
+async def is_bpom_negative_cached(db: AsyncSession, bpom_number: str) -> bool:
+    key = normalize_bpom_number(bpom_number)
+    if bpom_negative_memory_cache.get(key):
+        return True
+
+    entry = (await db.execute(
+        select(BPOMNegativeCache).where(BPOMNegativeCache.bpom_number == key)
+    )).scalars().first()
+    if entry:
+        expiry_date = entry.last_checked + timedelta(hours=settings.BPOM_NEGATIVE_CACHE_HOURS)
+        remaining = (expiry_date - datetime.now()).total_seconds()
+        if remaining > 0:
+            bpom_negative_memory_cache.set(key, True, ttl=remaining)
+            return True
+    return False
+
+async def create_bpom_negative_cache(db: AsyncSession, bpom_number: str):
+    key = normalize_bpom_number(bpom_number)
+    if not key:
+        return
+
+    existing = (await db.execute(
+        select(BPOMNegativeCache).where(BPOMNegativeCache.bpom_number == key)
+    )).scalars().first()
+    if existing:
+        existing.last_checked = datetime.now()
+    else:
+        db.add(BPOMNegativeCache(bpom_number=key))
+    # Nomor yang sekarang "tidak ditemukan" tidak boleh lagi disajikan dari cache lama
+    await db.execute(delete(BPOMCache).where(BPOMCache.bpom_number == key))
+    await db.commit()
+
+    bpom_memory_cache.invalidate(key)
+    bpom_negative_memory_cache.invalidate(key)
+
+async def purge_bpom_negative_cache(db: AsyncSession) -> int:
+    deleted = (await db.execute(delete(BPOMNegativeCache))).rowcount
+    await db.commit()
+    bpom_negative_memory_cache.clear()
+    return deleted
+
+async def create_bpom_cache(db: AsyncSession, bpom_number: str, data: dict):
+    key = normalize_bpom_number(bpom_number)
+    if not key:
+        return
+
+    existing = (await db.execute(select(BPOMCache).where(BPOMCache.bpom_number == key))).scalars().first()
     if existing:
         existing.data = data
         existing.last_updated = datetime.now()
-        db.commit()
-        db.refresh(existing)
+        await db.commit()
+        await db.refresh(existing)
     else:
-        new_cache = BPOMCache(bpom_number=bpom_number, data=data)
+        new_cache = BPOMCache(bpom_number=key, data=data)
         db.add(new_cache)
-        db.commit()
+        await db.commit()
+
+    # Nomor yang sekarang ditemukan tidak boleh lagi dijawab "tidak ditemukan"
+    deleted = await db.execute(delete(BPOMNegativeCache).where(BPOMNegativeCache.bpom_number == key))
+    if deleted.rowcount:
+        await db.commit()
+
+    bpom_memory_cache.invalidate(key)
+    bpom_negative_memory_cache.invalidate(key)
+
+async def save_bpom_scrape_result(bpom_number: str, data: Optional[dict]):
+    """on_result untuk BPOMScraper.search_bpom. Scrape berjalan di task single-flight yang
+    di-shield, jadi callback bisa selesai setelah request/stream pemanggil ditutup; karena itu
+    memakai session sendiri, bukan session milik request."""
+    async with AsyncSessionLocal() as db:
+        if data:
+            await create_bpom_cache(db, bpom_number, data)
+        else:
+            await create_bpom_negative_cache(db, bpom_number)
 
-def create_bpom_history(db: Session, user_id: int, data: dict, session_id: str = None):
+async def create_bpom_history(db: AsyncSession, user_id: int, data: dict, session_id: str = None):
     if not data:
         return None
         
-    query = db.query(ScanHistoryBPOM)
+    query = select(ScanHistoryBPOM)
     
     if user_id:
-        query = query.filter(ScanHistoryBPOM.user_id == user_id)
+        query = query.where(ScanHistoryBPOM.user_id == user_id)
     else:
-        query = query.filter(ScanHistoryBPOM.session_id == session_id)
+        query = query.where(ScanHistoryBPOM.session_id == session_id)
     
     bpom_num = data.get("bpom_number")
     if not bpom_num:
         return None
         
-    existing_scan = query.filter(
-        ScanHistoryBPOM.bpom_number == bpom_num
-    ).first()
+    # Satu produk bisa tersimpan sebagai "MD 123" atau "MD123": cocokkan semua bentuknya,
+    # termasuk nilai mentah yang memang disimpan (mis. "P-IRT 2063273010045-23")
+    variants = {bpom_num, *get_bpom_number_variants(bpom_num)}
+    existing_scan = (await db.execute(query.where(
+        ScanHistoryBPOM.bpom_number.in_(list(variants))
+    ))).scalars().first()
 
     if existing_scan:
         existing_scan.created_at = datetime.now()
@@ -51,8 +389,8 @@ def create_bpom_history(db: Session, user_id: int, data: dict, session_id: str =
         if not existing_scan.session_id and session_id:
             existing_scan.session_id = session_id
             
-        db.commit()
-        db.refresh(existing_scan)
+        await db.commit()
+        await db.refresh(existing_scan)
         return existing_scan
 
     db_scan = ScanHistoryBPOM(
@@ -66,49 +404,49 @@ def create_bpom_history(db: Session, user_id: int, data: dict, session_id: str =
         raw_response=data
     )
     db.add(db_scan)
-    db.commit()
-    db.refresh(db_scan)
+    await db.commit()
+    await db.refresh(db_scan)
     return db_scan
 
-def get_daily_ocr_scans_count(db: Session, user_id: int = None, session_id: str = None) -> int:
+async def get_daily_ocr_scans_count(db: AsyncSession, user_id: int = None, session_id: str = None) -> int:
     """Counts the number of OCR scans performed by a user or guest today."""
     
     today_start = datetime.combine(date.today(), time.min)
     
-    query = db.query(ScanHistoryOCR).filter(
+    query = select(func.count(ScanHistoryOCR.id)).where(
         ScanHistoryOCR.created_at >= today_start
     )
     
     if user_id:
-        query = query.filter(ScanHistoryOCR.user_id == user_id)
+        query = query.where(ScanHistoryOCR.user_id == user_id)
     elif session_id:
-        query = query.filter(ScanHistoryOCR.session_id == session_id)
+        query = query.where(ScanHistoryOCR.session_id == session_id)
         
-    return query.count()
+    return (await db.execute(query)).scalar_one()
 
-def create_ocr_history(db: Session, user_id: int, product_name: str, image_data: str, 
+async def create_ocr_history(db: AsyncSession, user_id: int, product_name: str, image_path: str, 
                        health_score: int, grade: str, ocr_data: str, ai_analysis: str, 
                        pros: list = None, cons: list = None, ingredients: str = None, 
                        warnings: list = None, session_id: str = None):
-    query = db.query(ScanHistoryOCR)
+    query = select(ScanHistoryOCR)
     if user_id:
-        query = query.filter(ScanHistoryOCR.user_id == user_id)
+        query = query.where(ScanHistoryOCR.user_id == user_id)
     else:
-        query = query.filter(ScanHistoryOCR.session_id == session_id)
+        query = query.where(ScanHistoryOCR.session_id == session_id)
         
-    last_scan = query.order_by(ScanHistoryOCR.created_at.desc()).first()
+    last_scan = (await db.execute(query.order_by(ScanHistoryOCR.created_at.desc()).limit(1))).scalars().first()
 
     if last_scan and last_scan.ocr_raw_data == ocr_data:
         last_scan.created_at = datetime.now()
-        db.commit()
-        db.refresh(last_scan)
+        await db.commit()
+        await db.refresh(last_scan)
         return last_scan
 
     db_scan = ScanHistoryOCR(
         user_id=user_id,
         session_id=session_id or "guest",
         product_name=product_name,
-        image_data=image_data,
+        image_path=image_path,
         pros=pros,
         cons=cons,
         ingredients=ingredients,
@@ -119,14 +457,18 @@ def create_ocr_history(db: Session, user_id: int, product_name: str, image_data:
         ai_analysis=ai_analysis
     )
     db.add(db_scan)
-    db.commit()
-    db.refresh(db_scan)
+    await db.commit()
+    await db.refresh(db_scan)
     return db_scan
 
-def get_user_history(db: Session, user_id: int, limit: int = 20):
-    bpom = db.query(ScanHistoryBPOM).filter(ScanHistoryBPOM.user_id == user_id)\
-        .order_by(ScanHistoryBPOM.created_at.desc()).limit(limit).all()
-    ocr = db.query(ScanHistoryOCR).filter(ScanHistoryOCR.user_id == user_id)\
-        .order_by(ScanHistoryOCR.created_at.desc()).limit(limit).all()
+async def get_user_history(db: AsyncSession, user_id: int, limit: int = 20):
+    bpom = (await db.execute(
+        select(ScanHistoryBPOM).where(ScanHistoryBPOM.user_id == user_id)
+        .order_by(ScanHistoryBPOM.created_at.desc()).limit(limit)
+    )).scalars().all()
+    ocr = (await db.execute(
+        select(ScanHistoryOCR).where(ScanHistoryOCR.user_id == user_id)
+        .order_by(ScanHistoryOCR.created_at.desc()).limit(limit)
+    )).scalars().all()
     
     return bpom, ocr
\ No newline at end of file
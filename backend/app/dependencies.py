@@ -1,4 +1,4 @@
-from fastapi import Depends, HTTPException, status, Header
+from fastapi import Depends, HTTPException, status, Header, Request
 from fastapi.security import OAuth2PasswordBearer
 from jose import jwt, JWTError
 from typing import Optional
@@ -9,6 +9,7 @@ from app.core.database import get_db
 from app.crud import user as crud_user
 from app.schemas import user as schemas
 from app.models.user import User 
+from app.services.ai_service import GeminiService
 
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="/api/auth/login", auto_error=False)
 
@@ -75,4 +76,12 @@ async def verify_recaptcha_v3(
                 detail="Aktivitas mencurigakan terdeteksi. Akses ditolak."
             )
             
-    return True
\ No newline at end of file
+    return True
+
+def get_gemini_service(request: Request) -> GeminiService:
+    # Singleton dari lifespan; fallback jika app dijalankan tanpa lifespan
+    service = getattr(request.app.state, "gemini_service", None)
+    if service is None:
+        service = GeminiService()
+        request.app.state.gemini_service = service
+    return service
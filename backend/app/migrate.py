@@ -0,0 +1,24 @@
+"""Entry point migrasi skema (Alembic) dengan alembic.ini milik backend, dari folder mana pun:
+
+    python -m app.migrate upgrade head        # terapkan semua revisi
+    python -m app.migrate upgrade head --sql  # hanya cetak DDL untuk dijalankan manual
+    python -m app.migrate current             # revisi yang terpasang
+    python -m app.migrate revision --autogenerate -m "tambah index x"
+
+Database yang sudah dibuat dari database/schema.sql + database/migrations/001-007
+cukup ditandai sekali tanpa menjalankan DDL:
+
+    python -m app.migrate stamp 0001
+"""
+import sys
+from pathlib import Path
+from alembic.config import main as alembic_main
+
+ALEMBIC_INI = Path(__file__).resolve().parent.parent / "alembic.ini"
+
+def main(argv=None):
+    argv = list(sys.argv[1:] if argv is None else argv)
+    alembic_main(argv=["-c", str(ALEMBIC_INI), *argv], prog="python -m app.migrate")
+
+if __name__ == "__main__":
+    main()
@@ -24,6 +24,7 @@ class EducationArticle(Base):
     content = Column(Text, nullable=False)
     author = Column(String(100))
     thumbnail_url = Column(Text, nullable=True)
+    read_time = Column(String(20), server_default="5 min")
     view_count = Column(Integer, default=0)
     is_published = Column(Integer, default=1) 
     created_at = Column(DateTime(timezone=True), server_default=func.now())
@@ -40,6 +41,7 @@ class NutritionInfo(Base):
     description = Column(Text)
     benefits = Column(Text)
     sources = Column(Text)
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
 
 class Additive(Base):
     __tablename__ = "additives"
@@ -51,6 +53,7 @@ class Additive(Base):
     safety_level = Column(Enum(AdditiveSafety), default=AdditiveSafety.safe)
     description = Column(Text)
     health_risks = Column(Text)
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
 
 class Disease(Base):
     __tablename__ = "diseases"
@@ -59,4 +62,5 @@ class Disease(Base):
     name = Column(String(100), unique=True, nullable=False)
     description = Column(Text)
     dietary_recommendations = Column(Text)
-    foods_to_avoid = Column(Text)
\ No newline at end of file
+    foods_to_avoid = Column(Text)
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
\ No newline at end of file
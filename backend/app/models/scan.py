@@ -1,20 +1,29 @@
-from sqlalchemy import Column, Integer, String, Text, DateTime, Boolean, JSON, SmallInteger, ForeignKey, func
-from sqlalchemy.orm import relationship
+from sqlalchemy import Column, Integer, String, Text, DateTime, Boolean, JSON, SmallInteger, ForeignKey, Index, UniqueConstraint, func
+from sqlalchemy.orm import relationship, deferred
 from app.core.database import Base
 
 class ScanHistoryBPOM(Base):
     __tablename__ = "scan_history_bpom"
+    # Sama dengan database/schema.sql; riwayat difilter per user/session dan diurutkan created_at
+    __table_args__ = (
+        Index("idx_bpom_favorited", "is_favorited"),
+        Index("idx_bpom_user_favorited", "user_id", "is_favorited"),
+        Index("idx_bpom_user_created", "user_id", "created_at"),
+        Index("idx_bpom_session_created", "session_id", "created_at"),
+        Index("idx_bpom_user_number", "user_id", "bpom_number"),
+        Index("idx_bpom_created", "created_at"),
+    )
     
     id = Column(Integer, primary_key=True, index=True)
-    user_id = Column(Integer, ForeignKey("users.id"), nullable=True, index=True)
-    session_id = Column(String(100), nullable=False, index=True)
-    bpom_number = Column(String(50), nullable=False, index=True)
+    user_id = Column(Integer, ForeignKey("users.id"), nullable=True)
+    session_id = Column(String(100), nullable=False)
+    bpom_number = Column(String(50), nullable=False)
     product_name = Column(String(255), nullable=True)
     brand = Column(String(255), nullable=True)
     manufacturer = Column(String(255), nullable=True)
     status = Column(String(50), nullable=True)
     raw_response = Column(JSON, nullable=True)
-    is_favorited = Column(Boolean, default=False, index=True)
+    is_favorited = Column(Boolean, default=False)
     created_at = Column(DateTime(timezone=True), server_default=func.now())
 
     # Relationship
@@ -22,12 +31,21 @@ class ScanHistoryBPOM(Base):
 
 class ScanHistoryOCR(Base):
     __tablename__ = "scan_history_ocr"
+    __table_args__ = (
+        Index("idx_ocr_favorited", "is_favorited"),
+        Index("idx_ocr_user_favorited", "user_id", "is_favorited"),
+        Index("idx_ocr_user_created", "user_id", "created_at"),
+        Index("idx_ocr_session_created", "session_id", "created_at"),
+        Index("idx_ocr_created", "created_at"),
+    )
     
     id = Column(Integer, primary_key=True, index=True)
-    user_id = Column(Integer, ForeignKey("users.id"), nullable=True, index=True)
-    session_id = Column(String(100), nullable=False, index=True)
+    user_id = Column(Integer, ForeignKey("users.id"), nullable=True)
+    session_id = Column(String(100), nullable=False)
     product_name = Column(String(255), nullable=True)
-    image_data = Column(Text, nullable=True)
+    # Base64 lama; data baru disimpan di blob store (image_path). Deferred agar listing tidak ikut memuatnya.
+    image_data = deferred(Column(Text, nullable=True))
+    image_path = Column(String(255), nullable=True)
     ocr_raw_data = Column(JSON, nullable=True)
     ai_analysis = Column(Text, nullable=True)
     pros = Column(JSON, nullable=True)
@@ -36,7 +54,7 @@ class ScanHistoryOCR(Base):
     warnings = Column(JSON, nullable=True) 
     health_score = Column(SmallInteger, nullable=True)
     grade = Column(String(2), nullable=True)
-    is_favorited = Column(Boolean, default=False, index=True)
+    is_favorited = Column(Boolean, default=False)
     created_at = Column(DateTime(timezone=True), server_default=func.now())
 
     # Relationship
@@ -48,4 +66,55 @@ class BPOMCache(Base):
     id = Column(Integer, primary_key=True, index=True)
     bpom_number = Column(String(50), unique=True, nullable=False, index=True)
     data = Column(JSON, nullable=False)
-    last_updated = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
\ No newline at end of file
+    last_updated = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
+
+class BPOMNegativeCache(Base):
+    __tablename__ = "bpom_negative_cache"
+
+    id = Column(Integer, primary_key=True, index=True)
+    bpom_number = Column(String(50), unique=True, nullable=False, index=True)
+    last_checked = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
+
+class BPOMRegistry(Base):
+    """Snapshot lokal registry produk BPOM (hasil import dump), dicari sebelum scraping."""
+    __tablename__ = "bpom_registry"
+
+    id = Column(Integer, primary_key=True, index=True)
+    bpom_key = Column(String(50), unique=True, nullable=False, index=True)
+    bpom_number = Column(String(50), nullable=False)
+    product_name = Column(String(255), nullable=True)
+    brand = Column(String(255), nullable=True)
+    manufacturer = Column(String(255), nullable=True)
+    address = Column(Text, nullable=True)
+    issued_date = Column(String(50), nullable=True)
+    expired_date = Column(String(50), nullable=True)
+    composition = Column(Text, nullable=True)
+    packaging = Column(String(255), nullable=True)
+    status = Column(String(50), nullable=True)
+    qr_code = Column(String(255), nullable=True)
+    imported_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
+
+class AnalysisCache(Base):
+    """Hasil analisis AI per gambar label (content hash + perceptual hash), per bahasa & versi prompt."""
+    __tablename__ = "ocr_analysis_cache"
+    __table_args__ = (
+        UniqueConstraint("content_hash", "language", "prompt_version", name="uq_analysis_content"),
+        Index("idx_analysis_phash", "phash", "language", "prompt_version"),
+    )
+
+    id = Column(Integer, primary_key=True, index=True)
+    content_hash = Column(String(64), nullable=False)
+    phash = Column(String(64), nullable=True)
+    language = Column(String(10), nullable=False)
+    prompt_version = Column(String(20), nullable=False)
+    result = Column(JSON, nullable=False)
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+
+class ChatAnswerCache(Base):
+    __tablename__ = "chat_answer_cache"
+
+    id = Column(Integer, primary_key=True, index=True)
+    cache_key = Column(String(64), unique=True, nullable=False)
+    language = Column(String(10), nullable=False)
+    answer = Column(Text, nullable=False)
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
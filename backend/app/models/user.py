@@ -9,7 +9,8 @@ user_allergies = Table(
     'user_allergies',
     Base.metadata,
     Column('user_id', Integer, ForeignKey('users.id')),
-    Column('allergen_id', Integer, ForeignKey('allergens.id'))
+    Column('allergen_id', Integer, ForeignKey('allergens.id')),
+    Column('created_at', DateTime(timezone=True), server_default=func.now())
 )
 
 class UserRole(str, enum.Enum):
@@ -22,6 +23,7 @@ class Allergen(Base):
     name = Column(String(100), unique=True)
     description = Column(String(255))
     created_by = Column(Integer, ForeignKey('users.id'), nullable=True)
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
 
 class LocalizationSetting(Base):
     __tablename__ = "localization_settings"
@@ -1,18 +1,27 @@
-from fastapi import APIRouter, Depends, HTTPException, Query, UploadFile, File, Header
+from fastapi import APIRouter, Depends, HTTPException, Query, UploadFile, File, Header, BackgroundTasks, Request
 from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
 from typing import List, Optional
 from pydantic import BaseModel, EmailStr
 from datetime import datetime
-from app.core.database import get_db
-from app.dependencies import get_current_user
+from app.core.database import get_db, get_async_db, get_pool_stats, SessionLocal
+from app.dependencies import get_current_user, get_gemini_service
 from app.models.user import User, Allergen, LocalizationSetting
-from app.models.scan import ScanHistoryBPOM, ScanHistoryOCR
+from app.models.scan import ScanHistoryBPOM, ScanHistoryOCR, BPOMRegistry
 from app.models.education import EducationArticle, Additive, Disease, NutritionInfo
 from app.models.food import FoodCatalog
 from app.schemas.user import AuthorizationCode 
 from app.crud import admin as crud_admin
+from app.crud import scan as crud_scan
+from app.services.bpom_endpoint import BPOMScraper
+from app.services.bpom_refresher import bpom_refresher
+from app.services import bpom_registry
+from app.services.image_pipeline import get_pipeline_stats
+from app.services import ocr_engine
+from app.services.blob_store import thumbnail_url
 import secrets
 import os
+import tempfile
 from pathlib import Path
 
 UPLOAD_DIR = Path("uploads")
@@ -123,6 +132,82 @@ def get_admin_stats(
         "localization": total_localization # Added
     }
 
+@router.get("/metrics")
+def get_runtime_metrics(
+    request: Request,
+    admin: User = Depends(admin_required)
+):
+    # Angka per proses worker (bukan agregat semua worker)
+    return {
+        "bpom_cache": crud_scan.get_bpom_cache_stats(),
+        "analysis_cache": crud_scan.get_analysis_cache_stats(),
+        "chat_cache": crud_scan.get_chat_cache_stats(),
+        "db_pool": get_pool_stats(),
+        "image_pipeline": get_pipeline_stats(),
+        "ocr_pool": ocr_engine.ocr_pool.stats(),
+        "ocr_fast_path": ocr_engine.get_fast_path_stats(),
+        "bpom_scraper": BPOMScraper.inflight_stats(),
+        "bpom_refresher": bpom_refresher.stats(),
+        "gemini_keys": get_gemini_service(request).key_stats(),
+        "gemini_concurrency": get_gemini_service(request).concurrency_stats(),
+        "gemini_parsing": get_gemini_service(request).parse_stats()
+    }
+
+@router.delete("/bpom-cache/negative")
+async def purge_bpom_negative_cache(
+    db: AsyncSession = Depends(get_async_db),
+    admin: User = Depends(admin_required)
+):
+    # Tier in-memory hanya dikosongkan di worker yang menerima request ini
+    deleted = await crud_scan.purge_bpom_negative_cache(db)
+    return {"success": True, "deleted": deleted}
+
+@router.post("/bpom-registry/import")
+async def import_bpom_registry(
+    background_tasks: BackgroundTasks,
+    file: UploadFile = File(...),
+    chunk_size: int = 1000,
+    admin: User = OWNER_WRITE_DEPENDENCY
+):
+    if bpom_registry.import_status.get("state") in ("queued", "running"):
+        raise HTTPException(409, "Import registry BPOM masih berjalan")
+
+    suffix = Path(file.filename or "").suffix.lower()
+    if suffix not in (".csv", ".json", ".jsonl", ".ndjson"):
+        raise HTTPException(400, "Format file harus csv, json, atau jsonl")
+
+    # Salin ke file sementara per potongan agar dump besar tidak dimuat utuh ke memori
+    tmp = tempfile.NamedTemporaryFile(delete=False, suffix=suffix)
+    try:
+        while chunk := await file.read(1024 * 1024):
+            tmp.write(chunk)
+    finally:
+        tmp.close()
+
+    bpom_registry.import_status.update(state="queued")
+    background_tasks.add_task(_run_registry_import, tmp.name, chunk_size)
+    return {"success": True, "message": "Import registry BPOM dijalankan di background"}
+
+def _run_registry_import(path: str, chunk_size: int):
+    db = SessionLocal()
+    try:
+        bpom_registry.import_registry(db, path, chunk_size=chunk_size)
+    except Exception as e:
+        print(f"BPOM registry import failed: {e}")
+    finally:
+        db.close()
+        os.unlink(path)
+
+@router.get("/bpom-registry/status")
+def get_bpom_registry_status(
+    db: Session = Depends(get_db),
+    admin: User = Depends(admin_required)
+):
+    return {
+        "total": db.query(BPOMRegistry).count(),
+        "last_import": bpom_registry.import_status
+    }
+
 # ============= USER MANAGEMENT =============
 @router.get("/users")
 def get_all_users(
@@ -281,6 +366,7 @@ def get_all_ocr_scans(
             "user_name": s.user.name if s.user else "Unknown",
             "product_name": s.product_name,
             "health_score": s.health_score,
+            "thumbnail_url": thumbnail_url(s.image_path),
             "created_at": s.created_at.isoformat() if s.created_at else None
         } for s in scans],
         "total": total
@@ -1,16 +1,28 @@
-from fastapi import APIRouter, HTTPException, Depends, Header, status, Request
+from fastapi import APIRouter, HTTPException, Depends, Header, status, Request, UploadFile, File, Form
+from fastapi.responses import StreamingResponse
 from app.core.limiter import limiter
-from sqlalchemy.orm import Session
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import undefer
 from typing import Optional
-from app.core.database import get_db
-from app.services.bpom_endpoint import BPOMScraper
-from app.services.ai_service import GeminiService
-from app.schemas.scan import BPOMRequest, ScanResponse, AnalyzeImageRequest, ChatRequest
-from app.dependencies import get_current_user_optional, get_current_user, verify_recaptcha_v3
+from app.core.config import settings
+from app.core.database import get_async_db, AsyncSessionLocal
+from app.services.bpom_endpoint import BPOMScraper, normalize_bpom_number
+from app.services.bpom_refresher import bpom_refresher
+from app.services.ai_service import GeminiService, GeminiBusyError, ANALYSIS_PROMPT_VERSION, CHAT_ERROR_ANSWERS, CHAT_QUOTA_EXHAUSTED
+from app.services.analysis_cache import compute_image_keys, confirm_same_label, decode_image_base64
+from app.services.image_pipeline import preprocess_image_async, run_in_pipeline
+from app.services import ocr_engine
+from app.services.chat_cache import chat_cache_key
+from app.services.blob_store import store_image_async, image_url, thumbnail_url
+from app.schemas.scan import BPOMRequest, BPOMBatchRequest, ScanResponse, AnalyzeImageRequest, ChatRequest
+from app.dependencies import get_current_user_optional, get_current_user, verify_recaptcha_v3, get_gemini_service
 from app.crud import scan as crud_scan 
 from app.models.scan import ScanHistoryBPOM, ScanHistoryOCR
 from app.models.user import User
+import asyncio
 import json
+from functools import partial
 from datetime import date
 
 router = APIRouter(prefix="/api/scan", tags=["Scan"])
@@ -20,7 +32,7 @@ MAX_FREE_OCR_SCANS_PER_DAY = 10
 @router.post("/bpom", response_model=ScanResponse)
 async def scan_bpom(
     request: BPOMRequest, 
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     current_user = Depends(get_current_user_optional),
     x_session_id: Optional[str] = Header(None),
     human_verified: bool = Depends(verify_recaptcha_v3)
@@ -29,16 +41,38 @@ async def scan_bpom(
     user_id = current_user.id if current_user else None
 
     # Cek Cache
-    cached_data = crud_scan.get_bpom_cache(db, request.bpom_number)
+    cached_data, is_stale = await crud_scan.get_bpom_cache_entry(db, request.bpom_number)
+    if is_stale:
+        if settings.BPOM_STALE_WHILE_REVALIDATE:
+            bpom_refresher.schedule_refresh(request.bpom_number)
+        else:
+            cached_data = None
+
     if cached_data:
-        history = crud_scan.create_bpom_history(db, user_id, cached_data, session_id)
+        history = await crud_scan.create_bpom_history(db, user_id, cached_data, session_id)
         response_data = cached_data.copy()
         response_data['id'] = history.id 
         return {"found": True, "message": "Data ditemukan (Cache)", "data": response_data}
 
+    registry_data = await crud_scan.get_bpom_registry(db, request.bpom_number)
+    if registry_data:
+        history = await crud_scan.create_bpom_history(db, user_id, registry_data, session_id)
+        registry_data['id'] = history.id
+        return {"found": True, "message": "Data ditemukan (Registry)", "data": registry_data}
+
+    if await crud_scan.is_bpom_negative_cached(db, request.bpom_number):
+        return {
+            "found": False,
+            "message": f"Produk dengan kode {request.bpom_number} tidak ditemukan.",
+            "data": None
+        }
+
     try:
         scraper = BPOMScraper()
-        result = await scraper.search_bpom(request.bpom_number)
+        result = await scraper.search_bpom(
+            request.bpom_number,
+            on_result=partial(crud_scan.save_bpom_scrape_result, request.bpom_number),
+        )
     except Exception as e:
         return {
             "found": False,
@@ -53,27 +87,134 @@ async def scan_bpom(
             "data": None
         }
     
-    crud_scan.create_bpom_cache(db, request.bpom_number, result)
-    history = crud_scan.create_bpom_history(db, user_id, result, session_id)
+    history = await crud_scan.create_bpom_history(db, user_id, result, session_id)
     result['id'] = history.id 
     
     return {"found": True, "message": "Data ditemukan", "data": result}
 
-@router.post("/analyze")
-@limiter.limit("10/day") 
-async def analyze_ocr(
-    request: Request, 
-    body: AnalyzeImageRequest, 
-    db: Session = Depends(get_db),
+@router.post("/bpom/batch")
+@limiter.limit("20/hour")
+async def scan_bpom_batch(
+    request: Request,
+    body: BPOMBatchRequest,
+    db: AsyncSession = Depends(get_async_db),
     current_user = Depends(get_current_user_optional),
-    x_session_id: Optional[str] = Header(None), 
-    is_human: bool = Depends(verify_recaptcha_v3) 
+    x_session_id: Optional[str] = Header(None),
+    human_verified: bool = Depends(verify_recaptcha_v3)
+):
+    session_id = x_session_id or "guest"
+    user_id = current_user.id if current_user else None
+
+    # Satu entri per nomor ternormalisasi, urutan input dipertahankan
+    unique = {}
+    for number in body.bpom_numbers:
+        number = (number or "").strip()
+        key = normalize_bpom_number(number)
+        if key and key not in unique:
+            unique[key] = number
+    numbers = list(unique.values())
+
+    if not numbers:
+        raise HTTPException(status_code=400, detail="Daftar nomor BPOM kosong.")
+    if len(numbers) > settings.BPOM_BATCH_MAX_ITEMS:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Maksimal {settings.BPOM_BATCH_MAX_ITEMS} nomor BPOM per request."
+        )
+
+    cached = await crud_scan.get_bpom_cache_bulk(db, numbers)
+    for number, (_data, is_stale) in cached.items():
+        if is_stale and settings.BPOM_STALE_WHILE_REVALIDATE:
+            bpom_refresher.schedule_refresh(number)
+    if not settings.BPOM_STALE_WHILE_REVALIDATE:
+        cached = {n: entry for n, entry in cached.items() if not entry[1]}
+
+    registry = await crud_scan.get_bpom_registry_bulk(db, [n for n in numbers if n not in cached])
+    negatives = await crud_scan.get_bpom_negative_bulk(
+        db, [n for n in numbers if n not in cached and n not in registry]
+    )
+    misses = [n for n in numbers if n not in cached and n not in registry and n not in negatives]
+
+    async def stream():
+        # Session sendiri: session dari dependency tidak dijamin hidup selama streaming
+        writer = AsyncSessionLocal()
+
+        async def line(number, found, source, data=None, error=None):
+            if found and body.record_history:
+                history = await crud_scan.create_bpom_history(writer, user_id, data, session_id)
+                data = dict(data, id=history.id if history else None)
+            item = {"bpom_number": number, "found": found, "source": source, "data": data}
+            if error:
+                item["error"] = error
+            return json.dumps(item, default=str) + "\n"
+
+        semaphore = asyncio.Semaphore(settings.BPOM_BATCH_CONCURRENCY)
+
+        async def resolve(number):
+            async with semaphore:
+                try:
+                    result = await BPOMScraper().search_bpom(
+                        number, on_result=partial(crud_scan.save_bpom_scrape_result, number)
+                    )
+                    return number, result, None
+                except Exception:
+                    return number, None, "Gagal terhubung ke server BPOM atau waktu habis."
+
+        tasks = [asyncio.create_task(resolve(n)) for n in misses]
+        try:
+            for number in numbers:
+                if number in cached:
+                    yield await line(number, True, "cache", dict(cached[number][0]))
+                elif number in registry:
+                    yield await line(number, True, "registry", registry[number])
+                elif number in negatives:
+                    yield await line(number, False, "cache")
+
+            for next_done in asyncio.as_completed(tasks):
+                number, result, error = await next_done
+                yield await line(number, bool(result), "bpom", result, error)
+        finally:
+            for task in tasks:
+                task.cancel()
+            await writer.close()
+
+    return StreamingResponse(stream(), media_type="application/x-ndjson")
+
+ANALYZE_LIMIT = "10/day"
+UPLOAD_CHUNK_SIZE = 1024 * 1024
+
+async def read_upload(file: UploadFile) -> bytes:
+    """Baca file multipart per chunk dengan batas MAX_UPLOAD_SIZE (Starlette sudah men-spool ke temp file)."""
+    if file.size is not None and file.size > settings.MAX_UPLOAD_SIZE:
+        raise HTTPException(status_code=413, detail="Ukuran gambar melebihi batas.")
+
+    chunks = []
+    total = 0
+    while chunk := await file.read(UPLOAD_CHUNK_SIZE):
+        total += len(chunk)
+        if total > settings.MAX_UPLOAD_SIZE:
+            raise HTTPException(status_code=413, detail="Ukuran gambar melebihi batas.")
+        chunks.append(chunk)
+    await file.close()
+
+    if not total:
+        raise HTTPException(status_code=400, detail="File gambar kosong.")
+    return b"".join(chunks)
+
+async def _analyze_image(
+    image_bytes: bytes,
+    product_name: str,
+    language_from_request: Optional[str],
+    db: AsyncSession,
+    current_user,
+    x_session_id: Optional[str],
+    service: GeminiService
 ):
     session_id = x_session_id or "guest"
     user_id = current_user.id if current_user else None
     
     if not (current_user and getattr(current_user, 'role', '') == 'admin'):
-        scan_count_today = crud_scan.get_daily_ocr_scans_count(
+        scan_count_today = await crud_scan.get_daily_ocr_scans_count(
             db, 
             user_id=user_id, 
             session_id=session_id
@@ -85,25 +226,65 @@ async def analyze_ocr(
                 detail=f"Batas harian tercapai. Login untuk akses lebih banyak."
             )
     
-    try:
-        service = GeminiService()
-        language_from_request = getattr(body, 'language', None) 
-        
-        if current_user and getattr(current_user, 'locale', None):
-            language = current_user.locale.split('-')[0].lower()
-        elif language_from_request:
-            language = language_from_request
-        else:
-            language = 'id'
-            
-        result = await service.analyze_nutrition_image(body.image_base64, language=language)
-    except Exception as e:
-         raise HTTPException(status_code=500, detail=str(e))
+    if current_user and getattr(current_user, 'locale', None):
+        language = current_user.locale.split('-')[0].lower()
+    elif language_from_request:
+        language = language_from_request
+    else:
+        language = 'id'
+
+    # Gambar yang sama (atau foto ulang label yang sama) tidak perlu dianalisis ulang oleh AI
+    image_keys = await run_in_pipeline(
+        compute_image_keys, image_bytes, perceptual=settings.ANALYSIS_CACHE_PERCEPTUAL
+    )
+    result = await crud_scan.get_analysis_cache(
+        db, image_keys.content_hash, language, ANALYSIS_PROMPT_VERSION
+    )
+    if result is None and image_keys.phash:
+        candidate = await crud_scan.get_analysis_cache_candidate(
+            db, image_keys.phash, language, ANALYSIS_PROMPT_VERSION
+        )
+        # phash sama belum tentu label sama (mis. hanya angka gula yang beda); cek teks labelnya
+        if candidate and await confirm_same_label(image_bytes, candidate[0]):
+            result = candidate[1]
 
     user_allergies = []
     if current_user:
         user_allergies = [allergy.name.lower() for allergy in current_user.allergies]
-    
+
+    # Fast path: label dengan tabel gizi yang terbaca jelas tidak perlu ke Gemini.
+    # Fast path tidak membaca komposisi, jadi user dengan alergi (termasuk hasil fast path
+    # yang sudah ter-cache) tetap lewat Gemini agar peringatan alergen tidak hilang.
+    if result is not None and user_allergies and result.get('source') == 'local_ocr':
+        result = None
+    if result is None and settings.OCR_FAST_PATH and not user_allergies:
+        extraction = await ocr_engine.try_fast_path(image_bytes)
+        if extraction is not None:
+            result = service.analysis_from_nutrition(extraction.nutrition, language)
+            await crud_scan.create_analysis_cache(
+                db, image_keys.content_hash, image_keys.phash, language, ANALYSIS_PROMPT_VERSION, result
+            )
+
+    if result is None:
+        try:
+            processed = await preprocess_image_async(image_bytes)
+        except Exception:
+            raise HTTPException(status_code=400, detail="Gagal memproses gambar. Pastikan format valid.")
+
+        try:
+            result = await service.analyze_nutrition_bytes(
+                processed.data, mime_type=processed.mime_type, language=language
+            )
+        except GeminiBusyError as e:
+            raise HTTPException(status_code=status.HTTP_503_SERVICE_UNAVAILABLE, detail=str(e))
+        except Exception as e:
+             raise HTTPException(status_code=500, detail=str(e))
+
+        if not result.get('error'):
+            await crud_scan.create_analysis_cache(
+                db, image_keys.content_hash, image_keys.phash, language, ANALYSIS_PROMPT_VERSION, result
+            )
+
     ingredients = result.get('ingredients') or ""
     ingredients_text = ingredients.lower()
     detected_allergens = [
@@ -114,8 +295,6 @@ async def analyze_ocr(
 
     nutrition_data = result.get('nutrition')
     ai_analysis = result.get('summary')
-    product_name = body.product_name 
-    image_data = body.image_base64 
     pros = result.get('pros')
     cons = result.get('cons')
     warnings = detected_allergens
@@ -123,11 +302,18 @@ async def analyze_ocr(
     grade = result.get('grade')
     ocr_data_str = json.dumps(nutrition_data)
 
-    history = crud_scan.create_ocr_history(
+    # Gambar disimpan ke blob store; riwayat hanya menyimpan path-nya
+    try:
+        image_path = (await store_image_async(image_bytes)).path
+    except Exception as e:
+        image_path = None
+        print(f"Failed to store scan image: {e}")
+
+    history = await crud_scan.create_ocr_history(
         db=db, 
         user_id=user_id,
         product_name=product_name,
-        image_data=image_data,
+        image_path=image_path,
         pros=pros,
         cons=cons,
         ingredients=ingredients,
@@ -144,32 +330,80 @@ async def analyze_ocr(
         
     return {"success": True, "data": result}
 
+@router.post("/analyze")
+@limiter.shared_limit(ANALYZE_LIMIT, scope="scan-analyze")
+async def analyze_ocr(
+    request: Request, 
+    body: AnalyzeImageRequest, 
+    db: AsyncSession = Depends(get_async_db),
+    current_user = Depends(get_current_user_optional),
+    x_session_id: Optional[str] = Header(None), 
+    is_human: bool = Depends(verify_recaptcha_v3),
+    service: GeminiService = Depends(get_gemini_service)
+):
+    try:
+        image_bytes = decode_image_base64(body.image_base64)
+    except Exception:
+        raise HTTPException(status_code=400, detail="Gagal memproses gambar. Pastikan format valid.")
+
+    return await _analyze_image(
+        image_bytes, body.product_name, getattr(body, 'language', None),
+        db, current_user, x_session_id, service
+    )
+
+@router.post("/analyze/upload")
+@limiter.shared_limit(ANALYZE_LIMIT, scope="scan-analyze")
+async def analyze_ocr_upload(
+    request: Request,
+    file: UploadFile = File(...),
+    product_name: str = Form(...),
+    language: Optional[str] = Form("id"),
+    db: AsyncSession = Depends(get_async_db),
+    current_user = Depends(get_current_user_optional),
+    x_session_id: Optional[str] = Header(None),
+    is_human: bool = Depends(verify_recaptcha_v3),
+    service: GeminiService = Depends(get_gemini_service)
+):
+    """Varian multipart dari /analyze: gambar dikirim sebagai file biner, tanpa base64."""
+    image_bytes = await read_upload(file)
+    return await _analyze_image(
+        image_bytes, product_name, language, db, current_user, x_session_id, service
+    )
+
+async def _extract_text(image_bytes: bytes) -> dict:
+    try:
+        text = await ocr_engine.ocr_pool.run(ocr_engine.extract_text, image_bytes)
+        return {"success": True, "text": text}
+    except ocr_engine.OCRBusyError as e:
+        raise HTTPException(status_code=status.HTTP_429_TOO_MANY_REQUESTS, detail=str(e))
+    except Exception as e:
+        return {"success": False, "text": ""}
+
 @router.post("/ocr-text")
 async def extract_text_only(
     request: AnalyzeImageRequest,
     current_user = Depends(get_current_user_optional)
 ):
     try:
-        import pytesseract
-        from PIL import Image
-        import base64
-        from io import BytesIO
-        
-        if "," in request.image_base64:
-            img_data = request.image_base64.split(",")[1]
-        else:
-            img_data = request.image_base64
-        
-        image_bytes = base64.b64decode(img_data)
-        image = Image.open(BytesIO(image_bytes))
-        text = pytesseract.image_to_string(image, lang='ind+eng')
-        
-        return {"success": True, "text": text.strip()}
-    except Exception as e:
+        image_bytes = decode_image_base64(request.image_base64)
+    except Exception:
         return {"success": False, "text": ""}
+    return await _extract_text(image_bytes)
+
+@router.post("/ocr-text/upload")
+async def extract_text_only_upload(
+    file: UploadFile = File(...),
+    current_user = Depends(get_current_user_optional)
+):
+    image_bytes = await read_upload(file)
+    return await _extract_text(image_bytes)
 
 @router.post("/chat")
-async def chat_product(request: ChatRequest):
+async def chat_product(
+    request: ChatRequest,
+    db: AsyncSession = Depends(get_async_db),
+    service: GeminiService = Depends(get_gemini_service)
+):
     try:
         if not request.question or not request.question.strip():
             return {"answer": "Silakan ajukan pertanyaan."}
@@ -178,8 +412,13 @@ async def chat_product(request: ChatRequest):
         if not context or context == "null" or context == "{}":
              return {"answer": "Maaf, saya tidak memiliki data produk yang cukup untuk menjawab pertanyaan ini. Silakan scan ulang produk."}
 
-        service = GeminiService()
         language = getattr(request, 'language', 'id')
+
+        # Pertanyaan yang sama untuk produk yang sama dijawab dari cache
+        cache_key = chat_cache_key(context, request.question, language)
+        cached_answer = await crud_scan.get_chat_cache(db, cache_key)
+        if cached_answer is not None:
+            return {"answer": cached_answer, "cached": True}
         
         answer = await service.chat_about_product(
             context, 
@@ -187,25 +426,91 @@ async def chat_product(request: ChatRequest):
             language=language
         ) 
 
-        if answer.startswith("Quota") or answer.startswith("Terjadi kesalahan") or answer.startswith("Maaf, terjadi kesalahan tak terduga"):
-            return {"answer": answer} 
+        if answer not in CHAT_ERROR_ANSWERS:
+            await crud_scan.create_chat_cache(db, cache_key, language, answer)
 
-        return {"answer": answer}
+        return {"answer": answer, "cached": False}
         
     except Exception as e:
         print(f"Chat Error: {str(e)}")
         return {"answer": f"Maaf, terjadi kesalahan saat memproses pertanyaan Anda. Coba lagi. (Detail Server: {type(e).__name__})"}
 
+@router.post("/chat/stream")
+async def chat_product_stream(
+    request: Request,
+    body: ChatRequest,
+    service: GeminiService = Depends(get_gemini_service)
+):
+    """Server-sent events: event `token` per potongan jawaban, lalu `done` (atau `error`)."""
+
+    def event(name: str, data: dict) -> str:
+        return f"event: {name}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
+
+    async def stream():
+        if not body.question or not body.question.strip():
+            yield event("token", {"text": "Silakan ajukan pertanyaan."})
+            yield event("done", {})
+            return
+
+        context = body.product_context
+        if not context or context == "null" or context == "{}":
+            yield event("token", {"text": "Maaf, saya tidak memiliki data produk yang cukup untuk menjawab pertanyaan ini. Silakan scan ulang produk."})
+            yield event("done", {})
+            return
+
+        language = getattr(body, 'language', 'id')
+        cache_key = chat_cache_key(context, body.question, language)
+
+        async with AsyncSessionLocal() as db:
+            cached_answer = await crud_scan.get_chat_cache(db, cache_key)
+        if cached_answer is not None:
+            yield event("token", {"text": cached_answer})
+            yield event("done", {"cached": True})
+            return
+
+        tokens = service.chat_about_product_stream(context, body.question, language=language)
+        parts = []
+        try:
+            async for text in tokens:
+                # Client putus: berhenti membaca, aclose() di bawah membatalkan stream ke Gemini
+                if await request.is_disconnected():
+                    break
+                parts.append(text)
+                yield event("token", {"text": text})
+            else:
+                answer = "".join(parts).strip()
+                if answer:
+                    async with AsyncSessionLocal() as db:
+                        await crud_scan.create_chat_cache(db, cache_key, language, answer)
+                yield event("done", {"cached": False})
+        except Exception as e:
+            print(f"Chat Stream Error: {str(e)}")
+            if isinstance(e, GeminiBusyError):
+                message = str(e)
+            elif service._is_quota_error(e):
+                message = CHAT_QUOTA_EXHAUSTED
+            else:
+                message = "Maaf, terjadi kesalahan saat memproses pertanyaan Anda. Coba lagi."
+            yield event("error", {"message": message})
+        finally:
+            await tokens.aclose()
+
+    return StreamingResponse(
+        stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
 @router.get("/bpom/{scan_id}")
-def get_bpom_detail(
+async def get_bpom_detail(
     scan_id: int,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     current_user: User = Depends(get_current_user)
 ):
-    scan = db.query(ScanHistoryBPOM).filter(
+    scan = (await db.execute(select(ScanHistoryBPOM).where(
         ScanHistoryBPOM.id == scan_id,
         ScanHistoryBPOM.user_id == current_user.id
-    ).first()
+    ))).scalars().first()
     
     if not scan:
         raise HTTPException(status_code=404, detail="Scan history tidak ditemukan")
@@ -227,15 +532,16 @@ def get_bpom_detail(
     }
 
 @router.get("/ocr/{scan_id}")
-def get_ocr_detail(
+async def get_ocr_detail(
     scan_id: int,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     current_user: User = Depends(get_current_user)
 ):
-    scan = db.query(ScanHistoryOCR).filter(
+    # image_data di-defer; ikut dimuat di sini karena lazy load tidak bisa di AsyncSession
+    scan = (await db.execute(select(ScanHistoryOCR).options(undefer(ScanHistoryOCR.image_data)).where(
         ScanHistoryOCR.id == scan_id,
         ScanHistoryOCR.user_id == current_user.id
-    ).first()
+    ))).scalars().first()
     
     if not scan:
         raise HTTPException(status_code=404, detail="Scan history tidak ditemukan")
@@ -246,7 +552,9 @@ def get_ocr_detail(
             "id": scan.id,
             "type": "ocr",
             "product_name": scan.product_name,
-            "image_data": scan.image_data,  
+            # Baris lama yang belum dimigrasi masih memakai data URI base64
+            "image_url": image_url(scan.image_path) or scan.image_data,
+            "thumbnail_url": thumbnail_url(scan.image_path),
             "ocr_raw_data": scan.ocr_raw_data,
             "ai_analysis": scan.ai_analysis,
             "pros": scan.pros,
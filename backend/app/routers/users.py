@@ -1,13 +1,15 @@
 from fastapi import APIRouter, Depends, HTTPException, UploadFile, File, Form 
 from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy import func
 from typing import List, Optional
 from pydantic import BaseModel
-from app.core.database import get_db
+from app.core.database import get_db, get_async_db
 from app.dependencies import get_current_user
 from app.crud import scan as crud_scan 
 from app.models.user import User, Allergen, LocalizationSetting
 from app.models.scan import ScanHistoryBPOM, ScanHistoryOCR
+from app.services.blob_store import thumbnail_url
 import shutil
 import uuid
 import re
@@ -254,13 +256,13 @@ def update_user_locale(
 @router.get("/history")
 async def get_history(
     type: str = None,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     current_user: User = Depends(get_current_user)
 ):
     # Get user timezone
     user_tz = pytz.timezone(current_user.timezone or 'Asia/Jakarta')
     
-    bpom_scans, ocr_scans = crud_scan.get_user_history(db, current_user.id)
+    bpom_scans, ocr_scans = await crud_scan.get_user_history(db, current_user.id)
     
     history_items = []
     for scan in bpom_scans:
@@ -283,6 +285,7 @@ async def get_history(
             "title": scan.product_name or "Analisis Nutrisi AI",
             "subtitle": f"Scan pada {scan_time.strftime('%d %b %Y')}",
             "score": scan.health_score,
+            "thumbnail_url": thumbnail_url(scan.image_path),
             "date": scan_time.isoformat(),
             "is_favorited": scan.is_favorited
         })
@@ -4,6 +4,10 @@ from typing import Optional, List, Any
 class BPOMRequest(BaseModel):
     bpom_number: str
 
+class BPOMBatchRequest(BaseModel):
+    bpom_numbers: List[str]
+    record_history: bool = False
+
 class BPOMData(BaseModel):
     id: Optional[int] = None
     bpom_number: str
@@ -31,4 +35,29 @@ class AnalyzeImageRequest(BaseModel):
 class ChatRequest(BaseModel):
     product_context: str 
     question: str
-    language: Optional[str] = "id"
\ No newline at end of file
+    language: Optional[str] = "id"
+
+class NutritionFacts(BaseModel):
+    calories: Optional[float] = 0
+    protein: Optional[float] = 0
+    fat: Optional[float] = 0
+    carbs: Optional[float] = 0
+    sugar: Optional[float] = 0
+    sodium: Optional[float] = 0
+    fiber: Optional[float] = 0
+    cholesterol: Optional[float] = 0
+    calcium: Optional[float] = 0
+    iron: Optional[float] = 0
+    potassium: Optional[float] = 0
+
+class NutritionAnalysis(BaseModel):
+    """Bentuk output analisis AI; dipakai sebagai response schema Gemini dan untuk validasi.
+    Field inti wajib: balasan kosong/terpotong harus gagal validasi (lalu diperbaiki), bukan di-cache."""
+    nutrition: NutritionFacts
+    health_score: int
+    grade: str
+    summary: str
+    pros: List[str] = []
+    cons: List[str] = []
+    ingredients: Optional[str] = None
+    warnings: List[str] = []
@@ -1,171 +1,196 @@
 from google import genai
+from google.genai import types
 from google.genai.errors import ClientError
 from app.core.config import settings
-from asyncio import to_thread
+from app.services.prompts import prompt_registry, language_pack, ANALYSIS_PROMPT_VERSION
+from app.schemas.scan import NutritionAnalysis, NutritionFacts
+from pydantic import ValidationError
 import json
 import re
-import base64
 import asyncio
 import logging
-from io import BytesIO
-from PIL import Image
+import time
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, Optional
 
 logger = logging.getLogger(__name__)
 
+ANALYSIS_MODEL = "gemini-2.5-flash"
+
+CHAT_UNAVAILABLE = "AI tidak tersedia"
+CHAT_QUOTA_EXHAUSTED = "Quota tercapai. Coba lagi nanti."
+CHAT_CONNECTION_ERROR = "Terjadi kesalahan koneksi."
+CHAT_UNEXPECTED_ERROR = "Maaf, terjadi kesalahan."
+GEMINI_BUSY_MESSAGE = "Layanan AI sedang sibuk. Coba lagi beberapa saat."
+# Jawaban pengganti saat gagal; tidak boleh masuk cache jawaban chat
+CHAT_ERROR_ANSWERS = frozenset({
+    CHAT_UNAVAILABLE, CHAT_QUOTA_EXHAUSTED, CHAT_CONNECTION_ERROR, CHAT_UNEXPECTED_ERROR, GEMINI_BUSY_MESSAGE
+})
+
+class GeminiBusyError(Exception):
+    """Antrean panggilan Gemini penuh lebih lama dari GEMINI_QUEUE_TIMEOUT."""
+
 class GeminiService:
+    """Satu instance per proses (dibuat di lifespan FastAPI). Client per key dibuat sekali dan
+    dipakai ulang; status kesehatan key (cooldown setelah 429/403) bertahan antar request."""
+
     def __init__(self):
         keys_str = settings.GEMINI_API_KEY or ""
         self.api_keys = [k.strip() for k in keys_str.split(",") if k.strip()]
-        self.current_key_index = 0
+        self._clients = {}
+        self.key_failures = [0] * len(self.api_keys)
+        self.key_cooldown_until = [0.0] * len(self.api_keys)
+
+        # Panggilan memakai client async SDK (tanpa thread); semaphore membatasi jumlah
+        # request bersamaan agar lonjakan scan mengantre, bukan membanjiri upstream
+        self._semaphore = asyncio.Semaphore(settings.GEMINI_MAX_CONCURRENCY)
+        self.in_flight = 0
+        self.waiting = 0
+        self.max_waiting = 0
+        self.calls = 0
+        self.rejected = 0
+        self.total_wait = 0.0
+
+        # Kegagalan parse per "model|key", dan hasil retry perbaikannya
+        self.parse_failures = {}
+        self.repaired = 0
+        self.repair_failed = 0
         
         if not self.api_keys:
             logger.error("GEMINI_API_KEY not configured")
-            self.client = None
-        else:
-            self._initialize_client()
-
-    def _initialize_client(self):
-        """Initialize client with the current active key"""
-        if self.api_keys:
-            current_key = self.api_keys[self.current_key_index]
-            masked_key = f"{current_key[:5]}...{current_key[-3:]}" if len(current_key) > 10 else "INVALID"
-            logger.info(f"Initializing Gemini Client with key index {self.current_key_index} ({masked_key})")
-            self.client = genai.Client(api_key=current_key)
-
-    def _rotate_key(self):
-        """Switch to the next available API key"""
-        if len(self.api_keys) > 1:
-            prev_index = self.current_key_index
-            self.current_key_index = (self.current_key_index + 1) % len(self.api_keys)
-            logger.warning(f"Rotating API Key from index {prev_index} to {self.current_key_index}")
-            self._initialize_client()
-            return True
-        return False
-
-    async def analyze_nutrition_image(self, image_base64: str, language: str = 'id'):
-        if not self.client:
-            raise Exception("API Key tidak tersedia")
 
-        if "," in image_base64:
-            image_base64 = image_base64.split(",")[1]
-        
+    def _mask_key(self, index: int) -> str:
+        key = self.api_keys[index]
+        return f"{key[:5]}...{key[-3:]}" if len(key) > 10 else "INVALID"
+
+    def _get_client(self, index: int):
+        """Client (dan connection pool-nya) per key dibuat sekali lalu dipakai ulang"""
+        client = self._clients.get(index)
+        if client is None:
+            logger.info(f"Initializing Gemini Client with key index {index} ({self._mask_key(index)})")
+            client = genai.Client(api_key=self.api_keys[index])
+            self._clients[index] = client
+        return client
+
+    def _pick_key(self, exclude=()) -> int:
+        """Key sehat (tidak cooldown, gagal paling sedikit) dipilih lebih dulu"""
+        now = time.monotonic()
+        candidates = [i for i in range(len(self.api_keys)) if i not in exclude] or list(range(len(self.api_keys)))
+        index = min(
+            candidates,
+            key=lambda i: (max(self.key_cooldown_until[i] - now, 0), self.key_failures[i], i)
+        )
+        return index
+
+    def _mark_key_exhausted(self, index: int):
+        self.key_failures[index] += 1
+        cooldown = min(
+            settings.GEMINI_KEY_COOLDOWN * (2 ** (self.key_failures[index] - 1)),
+            settings.GEMINI_KEY_MAX_COOLDOWN
+        )
+        self.key_cooldown_until[index] = time.monotonic() + cooldown
+        logger.warning(f"Key index {index} ({self._mask_key(index)}) cooling down for {cooldown}s")
+
+    def _mark_key_healthy(self, index: int):
+        self.key_failures[index] = 0
+        self.key_cooldown_until[index] = 0.0
+
+    def _is_quota_error(self, error: Exception) -> bool:
+        error_str = str(error)
+        return "429" in error_str or "403" in error_str or "RESOURCE_EXHAUSTED" in error_str
+
+    def key_stats(self) -> list:
+        now = time.monotonic()
+        return [{
+            "index": i,
+            "key": self._mask_key(i),
+            "failures": self.key_failures[i],
+            "cooldown_seconds": round(max(self.key_cooldown_until[i] - now, 0), 1),
+        } for i in range(len(self.api_keys))]
+
+    @asynccontextmanager
+    async def _slot(self):
+        self.waiting += 1
+        self.max_waiting = max(self.max_waiting, self.waiting)
+        started = time.monotonic()
         try:
-            image_bytes = base64.b64decode(image_base64)
-            image = Image.open(BytesIO(image_bytes))
-            
-            if image.mode == 'RGBA':
-                image = image.convert('RGB')
-                
-            logger.info(f"Processing image: {image.size}, {image.mode}")
-        except Exception as e:
-            logger.error(f"Image processing failed: {e}")
-            raise Exception("Gagal memproses gambar. Pastikan format valid.")
-
-        if language == 'en':
-            prompt_header = "Professionally analyze the nutrition label of this product."
-            output_instruction = "OUTPUT MUST BE VALID JSON WITHOUT MARKDOWN:"
-            rules_title = "IMPORTANT RULES:"
-            summary_desc = "2-3 sentences of objective analysis"
-            pros_desc = "2-3 nutritional advantages"
-            cons_desc = "2-3 nutritional disadvantages"
-            warnings_desc = '["High Sugar", "High Salt", "Artificial Sweeteners", "Preservatives", etc.]'
-            required_fill = "MUST fill ALL fields with valid values."
-            
-            example_summary = "This product has a relatively high sugar content and is low in fiber. Suitable as an occasional snack but not recommended for routine consumption."
-            example_pros = ["Contains calcium", "Low cholesterol"]
-            example_cons = ["High sugar", "Low fiber", "Fairly high sodium"]
-            example_ingredients = "Wheat flour, sugar, palm oil, milk powder, vanilla flavor"
-            example_warnings = ["High Sugar", "Contains Gluten"]
-
-        else: 
-            prompt_header = "Analisis label nutrisi produk ini secara profesional."
-            output_instruction = "OUTPUT HARUS JSON VALID TANPA MARKDOWN:"
-            rules_title = "ATURAN PENTING:"
-            summary_desc = "2-3 kalimat analisis objektif"
-            pros_desc = "2-3 keunggulan nutrisi"
-            cons_desc = "2-3 kekurangan nutrisi"
-            warnings_desc = '["Tinggi Gula", "Tinggi Garam", "Pemanis Buatan", "Pengawet", dll]'
-            required_fill = "WAJIB mengisi SEMUA field dengan nilai yang valid."
-
-            example_summary = "Produk ini memiliki kandungan gula yang cukup tinggi dan rendah serat. Cocok sebagai camilan sesekali namun tidak disarankan untuk konsumsi rutin."
-            example_pros = ["Mengandung kalsium", "Rendah kolesterol"]
-            example_cons = ["Tinggi gula", "Rendah serat", "Sodium cukup tinggi"]
-            example_ingredients = "Tepung terigu, gula, minyak sawit, susu bubuk, perisa vanila"
-            example_warnings = ["Tinggi Gula", "Mengandung Gluten"]
-
-        prompt = f"""{prompt_header}
-
-{output_instruction}
-
-{{
-    "nutrition": {{
-        "calories": 200,
-        "protein": 5.2,
-        "fat": 8.5,
-        "carbs": 35.0,
-        "sugar": 18.5,
-        "sodium": 180,
-        "fiber": 2.5,
-        "cholesterol": 10,
-        "calcium": 120,
-        "iron": 3,
-        "potassium": 250
-    }},
-    "health_score": 68,
-    "grade": "C",
-    "summary": "{example_summary}",
-    "pros": {example_pros},
-    "cons": {example_cons},
-    "ingredients": "{example_ingredients}",
-    "warnings": {example_warnings}
-}}
-
-{rules_title}
-- Baca SEMUA angka dengan teliti
-- health_score: 0-100 (100=very healthy, 0=unhealthy)
-  - >80: Grade A (Sangat Baik)
-  - 65-80: Grade B (Baik)
-  - 50-64: Grade C (Cukup)
-  - 35-49: Grade D (Kurang)
-  - <35: Grade E (Buruk)
-- Kriteria scoring:
-  - Kurangi score untuk: gula tinggi (>15g), sodium tinggi (>400mg), lemak jenuh tinggi
-  - Tambah score untuk: protein tinggi, serat tinggi, vitamin lengkap
-- summary: {summary_desc}
-- pros: {pros_desc}
-- cons: {cons_desc}
-- warnings: {warnings_desc}
-- Jika data tidak terbaca, estimasi berdasarkan jenis produk yang terlihat
-
-{required_fill}"""
+            await asyncio.wait_for(self._semaphore.acquire(), timeout=settings.GEMINI_QUEUE_TIMEOUT)
+        except asyncio.TimeoutError:
+            self.rejected += 1
+            raise GeminiBusyError(GEMINI_BUSY_MESSAGE)
+        finally:
+            self.waiting -= 1
+
+        self.calls += 1
+        self.total_wait += time.monotonic() - started
+        self.in_flight += 1
+        try:
+            yield
+        finally:
+            self.in_flight -= 1
+            self._semaphore.release()
+
+    def concurrency_stats(self) -> dict:
+        return {
+            "limit": settings.GEMINI_MAX_CONCURRENCY,
+            "in_flight": self.in_flight,
+            "waiting": self.waiting,
+            "max_waiting": self.max_waiting,
+            "calls": self.calls,
+            "rejected": self.rejected,
+            "avg_wait_ms": round(self.total_wait / self.calls * 1000, 1) if self.calls else 0.0,
+        }
+
+    async def close(self):
+        for client in self._clients.values():
+            try:
+                await client.aio.aclose()
+                client.close()
+            except Exception as e:
+                logger.warning(f"Failed to close Gemini client: {e}")
+        self._clients.clear()
+
+    async def analyze_nutrition_bytes(self, image_bytes: bytes, mime_type: str = "image/jpeg", language: str = 'id'):
+        """Untuk gambar yang sudah diproses image_pipeline (sudah diperkecil & di-encode ulang)"""
+        if not self.api_keys:
+            raise Exception("API Key tidak tersedia")
+
+        image = types.Part.from_bytes(data=image_bytes, mime_type=mime_type)
+        return await self._analyze_image_content(image, language)
+
+    async def _analyze_image_content(self, image, language: str):
+        prompt = prompt_registry.get("analysis", language)
 
         max_attempts = len(self.api_keys) * 2 
         response = None
+        tried = set()
         
         for attempt in range(max_attempts):
+            key_index = self._pick_key(exclude=tried)
             try:
-                response = await to_thread(
-                    self.client.models.generate_content, 
-                    model="gemini-2.5-flash", 
-                    contents=[prompt, image]
-                )
+                async with self._slot():
+                    response = await self._get_client(key_index).aio.models.generate_content(
+                        model=ANALYSIS_MODEL, 
+                        contents=[prompt.render(), image],
+                        config=prompt.config
+                    )
+                self._mark_key_healthy(key_index)
                 break 
             except ClientError as e:
-                error_str = str(e)
-                is_quota_error = "429" in error_str or "403" in error_str or "RESOURCE_EXHAUSTED" in error_str
-                
-                if is_quota_error:
-                    logger.warning(f"Quota error on key index {self.current_key_index}: {e}")
+                if self._is_quota_error(e):
+                    logger.warning(f"Quota error on key index {key_index}: {e}")
+                    self._mark_key_exhausted(key_index)
+                    tried.add(key_index)
                     
-                    rotated = self._rotate_key()
-                    if rotated:
-                        logger.info("Retrying immediately with new key...")
+                    if len(tried) < len(self.api_keys):
+                        logger.info("Retrying immediately with next key...")
                         continue
                     else:
                         if attempt < max_attempts - 1:
                             wait_time = 2 * (attempt + 1)
-                            logger.warning(f"Single key rate limit, waiting {wait_time}s")
+                            logger.warning(f"All keys rate limited, waiting {wait_time}s")
                             await asyncio.sleep(wait_time)
+                            tried.clear()
                         else:
                             raise 
                 else:
@@ -180,14 +205,17 @@ class GeminiService:
 
         logger.info(f"AI Response length: {len(response.text)}")
         
-        try:
-            json_str = self._extract_json(response.text)
-            data = json.loads(json_str)
-        except (ValueError, json.JSONDecodeError) as e:
-            logger.error(f"Failed to parse JSON: {e} | Response: {response.text[:100]}...")
+        analysis = self._parse_analysis(response.text)
+        if analysis is None:
+            self._record_parse_failure(key_index, ANALYSIS_MODEL)
+            logger.error(f"Failed to parse AI response | Response: {response.text[:100]}...")
+            # Hanya kasus gagal parse yang diulang, tanpa gambar (cukup teks respon sebelumnya)
+            analysis = await self._repair_analysis(response.text, language)
+        if analysis is None:
             return {"error": "Gagal memproses respon AI (Format Invalid)"}
         
-        nutrition = data.get("nutrition", {})
+        data = analysis.model_dump()
+        nutrition = {field: value or 0 for field, value in data["nutrition"].items()}
         
         if not data.get("health_score"):
             data["health_score"] = self._calculate_fallback_score(nutrition)
@@ -197,26 +225,77 @@ class GeminiService:
             data["summary"] = "Analisis nutrisi berhasil dilakukan."
         
         return {
-            "nutrition": {
-                "calories": nutrition.get("calories", 0),
-                "protein": nutrition.get("protein", 0),
-                "fat": nutrition.get("fat", 0),
-                "carbs": nutrition.get("carbs", 0),
-                "sugar": nutrition.get("sugar", 0),
-                "sodium": nutrition.get("sodium", 0),
-                "fiber": nutrition.get("fiber", 0),
-                "cholesterol": nutrition.get("cholesterol", 0),
-                "calcium": nutrition.get("calcium", 0),
-                "iron": nutrition.get("iron", 0),
-                "potassium": nutrition.get("potassium", 0)
-            },
-            "health_score": data.get("health_score", 50),
-            "grade": data.get("grade", "C"),
-            "summary": data.get("summary", ""),
-            "pros": data.get("pros", []),
-            "cons": data.get("cons", []),
-            "ingredients": data.get("ingredients", ""),
-            "warnings": data.get("warnings", [])
+            "nutrition": nutrition,
+            "health_score": data["health_score"],
+            "grade": data["grade"],
+            "summary": data["summary"],
+            "pros": data["pros"],
+            "cons": data["cons"],
+            "ingredients": data["ingredients"] or "",
+            "warnings": data["warnings"]
+        }
+
+    def _parse_analysis(self, text: str) -> Optional[NutritionAnalysis]:
+        try:
+            return NutritionAnalysis.model_validate_json(text)
+        except ValidationError:
+            pass
+        # Mode non-structured (atau model tetap membungkus dengan markdown)
+        try:
+            return NutritionAnalysis.model_validate(json.loads(self._extract_json(text)))
+        except (ValueError, ValidationError):
+            return None
+
+    async def _repair_analysis(self, response_text: str, language: str) -> Optional[NutritionAnalysis]:
+        prompt = prompt_registry.get("analysis_repair", language)
+        key_index = self._pick_key()
+        try:
+            async with self._slot():
+                response = await self._get_client(key_index).aio.models.generate_content(
+                    model=ANALYSIS_MODEL,
+                    contents=prompt.render(response_text=response_text),
+                    config=prompt.config
+                )
+        except (ClientError, GeminiBusyError) as e:
+            logger.error(f"Repair call failed: {e}")
+            self.repair_failed += 1
+            return None
+
+        analysis = self._parse_analysis(response.text or "")
+        if analysis is None:
+            self._record_parse_failure(key_index, ANALYSIS_MODEL)
+            self.repair_failed += 1
+        else:
+            self.repaired += 1
+        return analysis
+
+    def _record_parse_failure(self, key_index: int, model: str):
+        label = f"{model}|{self._mask_key(key_index)}"
+        self.parse_failures[label] = self.parse_failures.get(label, 0) + 1
+
+    def parse_stats(self) -> dict:
+        return {
+            "structured_output": settings.GEMINI_STRUCTURED_OUTPUT,
+            "failures": dict(self.parse_failures),
+            "repaired": self.repaired,
+            "repair_failed": self.repair_failed,
+        }
+
+    def analysis_from_nutrition(self, nutrition: dict, language: str = 'id') -> dict:
+        """Hasil analisis berbentuk sama dengan output AI, dari nilai gizi hasil OCR lokal."""
+        nutrition = NutritionFacts(**nutrition).model_dump()
+        nutrition = {field: value or 0 for field, value in nutrition.items()}
+        health_score = self._calculate_fallback_score(nutrition)
+        return {
+            "nutrition": nutrition,
+            "health_score": health_score,
+            "grade": self._score_to_grade(health_score),
+            "summary": language_pack(language)["local_summary"],
+            "pros": [],
+            "cons": [],
+            "ingredients": "",
+            "warnings": [],
+            "source": "local_ocr"
         }
 
     def _calculate_fallback_score(self, data):
@@ -244,44 +323,96 @@ class GeminiService:
         return "E"
 
     async def chat_about_product(self, product_context: str, user_question: str, language: str):
-        if not self.client:
-            return "AI tidak tersedia"
-
-        prompt = f"""Konteks Produk: {product_context}
-
-Pertanyaan: "{user_question}"
+        if not self.api_keys:
+            return CHAT_UNAVAILABLE
 
-Jawab singkat (max 3 kalimat), edukatif, tanpa bold/italic. Jawab dalam bahasa {language}."""
+        prompt = prompt_registry.get("chat", language)
+        contents = prompt.render(product_context=product_context, user_question=user_question)
 
         max_attempts = len(self.api_keys) + 1
+        tried = set()
         
         for attempt in range(max_attempts):
+            key_index = self._pick_key(exclude=tried)
             try:
-                response = await to_thread(
-                    self.client.models.generate_content,
-                    model="gemini-2.0-flash",
-                    contents=prompt
-                )
+                async with self._slot():
+                    response = await self._get_client(key_index).aio.models.generate_content(
+                        model="gemini-2.0-flash",
+                        contents=contents,
+                        config=prompt.config
+                    )
+                self._mark_key_healthy(key_index)
                 return response.text.strip().replace("**", "").replace("*", "")
             except ClientError as e:
-                error_str = str(e)
-                if "429" in error_str or "403" in error_str or "RESOURCE_EXHAUSTED" in error_str:
-                    if self._rotate_key():
+                if self._is_quota_error(e):
+                    self._mark_key_exhausted(key_index)
+                    tried.add(key_index)
+                    if len(tried) < len(self.api_keys):
                         continue 
                     else:
                         logger.error(f"Chat quota exhausted on all keys: {e}")
-                        return "Quota tercapai. Coba lagi nanti."
+                        return CHAT_QUOTA_EXHAUSTED
                 
                 logger.error(f"Chat error: {e}")
-                return "Terjadi kesalahan koneksi."
+                return CHAT_CONNECTION_ERROR
+            except GeminiBusyError as e:
+                return str(e)
             except Exception as e:
                 logger.error(f"Unexpected Chat error: {e}")
-                return "Maaf, terjadi kesalahan."
+                return CHAT_UNEXPECTED_ERROR
+
+    async def chat_about_product_stream(self, product_context: str, user_question: str, language: str) -> AsyncIterator[str]:
+        """Versi streaming dari chat_about_product. Rotasi key hanya terjadi sebelum token pertama;
+        setelah itu error diteruskan ke caller. Menutup generator membatalkan stream ke Gemini."""
+        if not self.api_keys:
+            raise Exception(CHAT_UNAVAILABLE)
+
+        prompt = prompt_registry.get("chat", language)
+        contents = prompt.render(product_context=product_context, user_question=user_question)
+        tried = set()
+
+        async with self._slot():
+            while True:
+                key_index = self._pick_key(exclude=tried)
+                stream = None
+                try:
+                    stream = await self._get_client(key_index).aio.models.generate_content_stream(
+                        model="gemini-2.0-flash",
+                        contents=contents,
+                        config=prompt.config
+                    )
+                    first = await anext(stream, None)
+                    self._mark_key_healthy(key_index)
+                    break
+                except ClientError as e:
+                    if stream is not None:
+                        await stream.aclose()
+                    if self._is_quota_error(e):
+                        self._mark_key_exhausted(key_index)
+                        tried.add(key_index)
+                        if len(tried) < len(self.api_keys):
+                            continue
+                        logger.error(f"Chat quota exhausted on all keys: {e}")
+                    raise
+
+            try:
+                chunk = first
+                while chunk is not None:
+                    if chunk.text:
+                        yield chunk.text.replace("**", "").replace("*", "")
+                    chunk = await anext(stream, None)
+            finally:
+                await stream.aclose()
 
     def _extract_json(self, text):
         text = re.sub(r'```(?:json)?\s*', '', text)
         text = re.sub(r'```\s*', '', text)
-        match = re.search(r'\{[^{}]*(?:\{[^{}]*\}[^{}]*)*\}', text, re.DOTALL)
-        if match:
-            return match.group(0)
+        # raw_decode membaca satu objek JSON utuh dari '{' pertama, berapapun kedalaman nesting-nya
+        start = text.find("{")
+        if start != -1:
+            try:
+                data, _ = json.JSONDecoder().raw_decode(text, start)
+                return json.dumps(data)
+            except json.JSONDecodeError:
+                pass
         raise ValueError("Invalid AI response format")
\ No newline at end of file
@@ -0,0 +1,88 @@
+import base64
+import difflib
+import hashlib
+import re
+from io import BytesIO
+from typing import List, NamedTuple, Optional
+from PIL import Image, ImageOps
+from app.services import ocr_engine
+
+# Ukuran dHash: 16 -> 256 bit. Lebih kasar dari ini rawan bentrok antar varian kemasan satu merek.
+PHASH_SIZE = 16
+# Gambar polos/buram menghasilkan hash (hampir) semua 0; hash seperti itu tidak membedakan apa pun
+PHASH_MIN_BITS = PHASH_SIZE * PHASH_SIZE // 8
+# Kemiripan minimal teks label (OCR) agar kandidat phash dianggap label yang sama
+LABEL_TEXT_MIN_SIMILARITY = 0.9
+
+perceptual_stats = {"candidates": 0, "confirmed": 0, "rejected": 0}
+
+class ImageKeys(NamedTuple):
+    content_hash: str
+    phash: Optional[str]
+
+def decode_image_base64(image_base64: str) -> bytes:
+    if "," in image_base64:
+        image_base64 = image_base64.split(",")[1]
+    return base64.b64decode(image_base64)
+
+def perceptual_hash(image_bytes: bytes) -> Optional[str]:
+    """dHash dari thumbnail grayscale ternormalisasi; foto ulang/re-encode label yang sama
+    menghasilkan hash yang sama walau byte-nya berbeda."""
+    try:
+        image = Image.open(BytesIO(image_bytes))
+        # JPEG bisa di-decode langsung pada skala kecil, jauh lebih murah dari decode penuh
+        image.draft("L", (PHASH_SIZE * 8, PHASH_SIZE * 8))
+        image = ImageOps.exif_transpose(image).convert("L")
+        image = ImageOps.autocontrast(image.resize((PHASH_SIZE + 1, PHASH_SIZE), Image.LANCZOS))
+    except Exception:
+        return None
+
+    pixels = list(image.getdata())
+    width = PHASH_SIZE + 1
+    bits = 0
+    for row in range(PHASH_SIZE):
+        for col in range(PHASH_SIZE):
+            left = pixels[row * width + col]
+            right = pixels[row * width + col + 1]
+            bits = (bits << 1) | (1 if left > right else 0)
+    set_bits = bin(bits).count("1")
+    if not PHASH_MIN_BITS <= set_bits <= PHASH_SIZE * PHASH_SIZE - PHASH_MIN_BITS:
+        return None
+    return f"{bits:0{PHASH_SIZE * PHASH_SIZE // 4}x}"
+
+def compute_image_keys(image_bytes: bytes, perceptual: bool = True) -> ImageKeys:
+    return ImageKeys(
+        content_hash=hashlib.sha256(image_bytes).hexdigest(),
+        phash=perceptual_hash(image_bytes) if perceptual else None
+    )
+
+def _label_tokens(text: str) -> List[str]:
+    return re.findall(r"\d+(?:[.,]\d+)?|[a-z]+", text.lower())
+
+def same_label_text(text_a: str, text_b: str) -> bool:
+    """Semua angka harus sama persis (Gula 10 g vs 30 g = label berbeda), sisa teks cukup mirip."""
+    tokens_a, tokens_b = _label_tokens(text_a), _label_tokens(text_b)
+    numbers_a = [t for t in tokens_a if t[0].isdigit()]
+    numbers_b = [t for t in tokens_b if t[0].isdigit()]
+    if not numbers_a or numbers_a != numbers_b:
+        return False
+    return difflib.SequenceMatcher(None, tokens_a, tokens_b).ratio() >= LABEL_TEXT_MIN_SIMILARITY
+
+async def confirm_same_label(image_bytes: bytes, candidate_hash: str) -> bool:
+    """Kandidat phash hanya dipakai jika teks label (OCR) kedua gambar sama. Gambar kandidat
+    diambil dari blob store (path-nya diturunkan dari sha256 yang sama dengan content_hash)."""
+    from app.services.blob_store import load_image
+
+    perceptual_stats["candidates"] += 1
+    candidate = load_image(candidate_hash)
+    confirmed = False
+    if candidate is not None:
+        try:
+            text_a = await ocr_engine.ocr_pool.run(ocr_engine.extract_text, image_bytes)
+            text_b = await ocr_engine.ocr_pool.run(ocr_engine.extract_text, candidate)
+            confirmed = same_label_text(text_a, text_b)
+        except Exception as e:
+            print(f"Perceptual cache confirmation failed: {type(e).__name__}: {e}")
+
+    perceptual_stats["confirmed" if confirmed else "rejected"] += 1
+    return confirmed
@@ -0,0 +1,163 @@
+"""Penyimpanan gambar scan di disk (content-addressed) di bawah UPLOAD_DIR.
+
+Gambar disimpan sekali per sha256 sehingga scan ulang gambar yang sama tidak menambah file.
+Baris scan_history_ocr hanya menyimpan path relatif (image_path); file dilayani StaticFiles
+di /api/uploads.
+
+Migrasi baris lama (kolom image_data base64) dari folder backend:
+    python -m app.services.blob_store --batch-size 200
+"""
+import argparse
+import asyncio
+import hashlib
+import os
+import tempfile
+from io import BytesIO
+from pathlib import Path
+from typing import Dict, NamedTuple, Optional
+from PIL import Image, ImageOps
+from sqlalchemy.orm import Session
+from app.core.config import settings
+from app.models.scan import ScanHistoryOCR
+from app.services.analysis_cache import decode_image_base64
+
+SCAN_DIR = "scans"
+THUMB_DIR = "thumbs"
+THUMB_SIZE = 320
+
+# MPO = JPEG multi-picture dari banyak kamera ponsel; frame pertamanya JPEG biasa
+_EXTENSIONS = {"JPEG": "jpg", "MPO": "jpg", "PNG": "png", "WEBP": "webp", "GIF": "gif"}
+
+class StoredImage(NamedTuple):
+    path: str
+    created: bool
+
+def _root() -> Path:
+    return Path(settings.UPLOAD_DIR)
+
+def _atomic_write(target: Path, data: bytes):
+    target.parent.mkdir(parents=True, exist_ok=True)
+    fd, tmp = tempfile.mkstemp(dir=target.parent, prefix=".tmp-")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(data)
+        os.replace(tmp, target)
+    except Exception:
+        if os.path.exists(tmp):
+            os.unlink(tmp)
+        raise
+
+def thumbnail_path(path: str) -> str:
+    """scans/ab/<hash>.png -> scans/thumbs/ab/<hash>.jpg"""
+    parts = Path(path)
+    return f"{SCAN_DIR}/{THUMB_DIR}/{parts.parent.name}/{parts.stem}.jpg"
+
+def image_url(path: Optional[str]) -> Optional[str]:
+    return f"/api/uploads/{path}" if path else None
+
+def thumbnail_url(path: Optional[str]) -> Optional[str]:
+    return image_url(thumbnail_path(path)) if path else None
+
+def _make_thumbnail(image: Image.Image) -> bytes:
+    image.draft("RGB", (THUMB_SIZE, THUMB_SIZE))
+    thumb = ImageOps.exif_transpose(image)
+    if thumb.mode not in ("RGB", "L"):
+        thumb = thumb.convert("RGB")
+    thumb.thumbnail((THUMB_SIZE, THUMB_SIZE), Image.LANCZOS)
+    output = BytesIO()
+    thumb.save(output, format="JPEG", quality=80, optimize=True)
+    return output.getvalue()
+
+def _reencode_jpeg(image: Image.Image) -> bytes:
+    image = ImageOps.exif_transpose(image)
+    if image.mode not in ("RGB", "L"):
+        image = image.convert("RGB")
+    output = BytesIO()
+    image.save(output, format="JPEG", quality=90)
+    return output.getvalue()
+
+def store_image(image_bytes: bytes) -> StoredImage:
+    """Simpan gambar + thumbnail; gambar yang sudah ada (hash sama) tidak ditulis ulang."""
+    image = Image.open(BytesIO(image_bytes))
+    extension = _EXTENSIONS.get(image.format)
+    if extension is None:
+        # Format lain (BMP, TIFF, HEIF, ...) disimpan sebagai JPEG, bukan dibuang
+        image_bytes = _reencode_jpeg(image)
+        image = Image.open(BytesIO(image_bytes))
+        extension = "jpg"
+
+    digest = hashlib.sha256(image_bytes).hexdigest()
+    path = f"{SCAN_DIR}/{digest[:2]}/{digest}.{extension}"
+    target = _root() / path
+    if target.exists():
+        return StoredImage(path=path, created=False)
+
+    # Thumbnail ditulis dulu: file utama yang ada selalu berarti thumbnail-nya juga ada
+    _atomic_write(_root() / thumbnail_path(path), _make_thumbnail(image))
+    _atomic_write(target, image_bytes)
+    return StoredImage(path=path, created=True)
+
+def load_image(content_hash: str) -> Optional[bytes]:
+    """Byte gambar tersimpan berdasarkan sha256-nya, None jika tidak ada."""
+    for target in (_root() / SCAN_DIR / content_hash[:2]).glob(f"{content_hash}.*"):
+        return target.read_bytes()
+    return None
+
+async def store_image_async(image_bytes: bytes) -> StoredImage:
+    return await asyncio.to_thread(store_image, image_bytes)
+
+def migrate_inline_images(db: Session, batch_size: int = 200) -> Dict:
+    """Pindahkan image_data base64 lama ke blob store per batch (keyset pagination by id)."""
+    stats = {"migrated": 0, "deduplicated": 0, "failed": 0}
+    last_id = 0
+
+    while True:
+        rows = db.query(ScanHistoryOCR.id, ScanHistoryOCR.image_data).filter(
+            ScanHistoryOCR.id > last_id,
+            ScanHistoryOCR.image_path.is_(None),
+            ScanHistoryOCR.image_data.isnot(None)
+        ).order_by(ScanHistoryOCR.id).limit(batch_size).all()
+        if not rows:
+            break
+
+        for row_id, image_data in rows:
+            last_id = row_id
+            try:
+                stored = store_image(decode_image_base64(image_data))
+            except Exception as e:
+                stats["failed"] += 1
+                print(f"Blob migration failed for scan_history_ocr #{row_id}: {e}")
+                continue
+
+            db.query(ScanHistoryOCR).filter(ScanHistoryOCR.id == row_id).update(
+                {ScanHistoryOCR.image_path: stored.path, ScanHistoryOCR.image_data: None},
+                synchronize_session=False
+            )
+            stats["migrated"] += 1
+            if not stored.created:
+                stats["deduplicated"] += 1
+
+        db.commit()
+        print(f"... sampai id {last_id}: {stats['migrated']} dipindahkan, {stats['failed']} gagal")
+
+    return stats
+
+def main():
+    from app.core.database import SessionLocal
+
+    parser = argparse.ArgumentParser(description="Pindahkan image_data scan_history_ocr ke blob store")
+    parser.add_argument("--batch-size", type=int, default=200)
+    args = parser.parse_args()
+
+    db = SessionLocal()
+    try:
+        stats = migrate_inline_images(db, batch_size=args.batch_size)
+    finally:
+        db.close()
+    print(
+        f"Selesai: {stats['migrated']} dipindahkan ({stats['deduplicated']} duplikat), "
+        f"{stats['failed']} gagal"
+    )
+
+if __name__ == "__main__":
+    main()
@@ -1,9 +1,52 @@
 import httpx
 from bs4 import BeautifulSoup
-from typing import Dict, Optional, List
+from typing import Awaitable, Callable, Dict, Optional, List, Union
+from app.core.config import settings
+from app.core.singleflight import SingleFlight
+import asyncio
+import inspect
 import re
+import time
+
+CSRF_META_RE = re.compile(r'<meta[^>]+name=["\']csrf-token["\'][^>]*>', re.IGNORECASE)
+CSRF_CONTENT_RE = re.compile(r'content=["\']([^"\']+)["\']', re.IGNORECASE)
+# 419 = Laravel "Page Expired" (token/sesi kedaluwarsa)
+CSRF_REJECTED_STATUSES = (401, 403, 419)
+
+class BPOMUpstreamError(Exception):
+    pass
+
+def normalize_bpom_number(bpom_number: str) -> str:
+    """Kunci kanonik nomor BPOM ("md 123", "MD-123" -> "MD123"). Dipakai bpom_cache,
+    bpom_negative_cache, bpom_registry, dedup history, dan registry scrape in-flight."""
+    return re.sub(r'[^a-zA-Z0-9]', '', bpom_number or '').upper()
+
+def get_bpom_number_variants(bpom_number: str) -> List[str]:
+    """Bentuk penulisan yang dianggap sama dengan nomor kanonik (urutan = prioritas pencarian)."""
+    clean = normalize_bpom_number(bpom_number)
+    
+    match = re.match(r'^([A-Z]{2}|PIRT)(\d+)$', clean)
+    if match:
+        prefix, number = match.groups()
+        # dict.fromkeys: buang varian duplikat (mis. "MD123" == clean) tanpa mengubah urutan
+        return list(dict.fromkeys([
+            f"{prefix} {number}", 
+            f"{prefix}{number}",  
+            clean                 
+        ]))
+    
+    return list(dict.fromkeys([bpom_number.strip().upper(), clean]))
 
 class BPOMScraper:
+    # Registry scrape yang sedang berjalan, dibagi semua instance dalam satu proses
+    _inflight = SingleFlight()
+
+    # Client HTTP (connection pool) dan token CSRF milik proses, dikelola lifespan FastAPI
+    _client: Optional[httpx.AsyncClient] = None
+    _csrf_token: Optional[str] = None
+    _csrf_expires_at: float = 0.0
+    _csrf_lock: Optional[asyncio.Lock] = None
+
     def __init__(self):
         self.base_url = "https://cekbpom.pom.go.id"
         self.headers = {
@@ -15,87 +58,236 @@ class BPOMScraper:
         }
 
     def _get_query_variants(self, bpom_number: str) -> list:
-        clean = re.sub(r'[^a-zA-Z0-9]', '', bpom_number).upper()
-        
-        match = re.match(r'^([A-Z]{2}|PIRT)(\d+)$', clean)
-        if match:
-            prefix, number = match.groups()
-            return [
-                f"{prefix} {number}", 
-                f"{prefix}{number}",  
-                clean                 
-            ]
-        
-        return [bpom_number.strip().upper()]
+        return [v for v in get_bpom_number_variants(bpom_number) if v]
+
+    async def search_bpom(
+        self,
+        bpom_number: str,
+        on_result: Optional[Callable[[Optional[Dict]], Union[None, Awaitable[None]]]] = None
+    ) -> Optional[Dict]:
+        """Request bersamaan untuk nomor yang sama menunggu satu scrape yang sama.
+        on_result hanya dipanggil sekali oleh scrape tersebut (mis. untuk menulis cache)."""
+        key = normalize_bpom_number(bpom_number) or bpom_number.strip().upper()
+
+        async def run():
+            result = await self._search_variants(bpom_number)
+            if on_result:
+                try:
+                    outcome = on_result(result)
+                    if inspect.isawaitable(outcome):
+                        await outcome
+                except Exception as e:
+                    print(f"Scraper on_result failed for '{key}': {e}")
+            return result
+
+        result = await self._inflight.do(key, run)
+        # Salinan per caller karena router menambahkan field 'id' sendiri
+        return dict(result) if result else None
+
+    @classmethod
+    def inflight_stats(cls) -> dict:
+        return cls._inflight.stats()
 
-    async def search_bpom(self, bpom_number: str) -> Optional[Dict]:
+    async def _search_variants(self, bpom_number: str) -> Optional[Dict]:
         variants = self._get_query_variants(bpom_number)
-        
+
+        if settings.BPOM_PARALLEL_VARIANTS and len(variants) > 1:
+            search = self._search_parallel(variants)
+        else:
+            search = self._search_sequential(variants)
+
+        # Satu batas waktu untuk seluruh pencarian; TimeoutError diteruskan ke router
+        return await asyncio.wait_for(search, timeout=settings.BPOM_SEARCH_DEADLINE)
+
+    async def _search_parallel(self, variants: List[str]) -> Optional[Dict]:
+        tasks = {asyncio.create_task(self._perform_request(q)): q for q in variants}
+        order = {q: i for i, q in enumerate(variants)}
+        pending = set(tasks)
+        errors = []
+
+        try:
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in sorted(done, key=lambda t: order[tasks[t]]):
+                    try:
+                        result = task.result()
+                    except BPOMUpstreamError as e:
+                        errors.append(e)
+                        continue
+                    if result:
+                        result['searched_code'] = tasks[task]
+                        return result
+            return self._not_found_or_raise(errors)
+        finally:
+            for task in pending:
+                task.cancel()
+
+    async def _search_sequential(self, variants: List[str]) -> Optional[Dict]:
+        errors = []
         for search_query in variants:
-            result = await self._perform_request(search_query)
+            try:
+                result = await self._perform_request(search_query)
+            except BPOMUpstreamError as e:
+                errors.append(e)
+                continue
             
             if result:
                 result['searched_code'] = search_query 
                 return result
         
+        return self._not_found_or_raise(errors)
+
+    def _not_found_or_raise(self, errors: List["BPOMUpstreamError"]) -> None:
+        # None berarti upstream menjawab "tidak ada" untuk semua varian (aman untuk negative cache)
+        if errors:
+            raise errors[0]
         return None
 
-    async def _perform_request(self, search_query: str) -> Optional[Dict]:
-        async with httpx.AsyncClient(timeout=45.0, follow_redirects=True) as client:
+    @classmethod
+    def _build_client(cls) -> httpx.AsyncClient:
+        http2 = settings.BPOM_HTTP2
+        if http2:
             try:
-                home_response = await client.get(self.base_url, headers=self.headers)
-                soup = BeautifulSoup(home_response.text, 'html.parser')
-                csrf_meta = soup.find('meta', {'name': 'csrf-token'})
-                
-                if not csrf_meta:
-                    return None
-                
-                csrf_token = csrf_meta['content']
-
-                post_data = {
-                    'draw': '1',
-                    'columns[0][data]': 'PRODUCT_ID',
-                    'columns[0][searchable]': 'false',
-                    'columns[0][orderable]': 'false',
-                    'columns[1][data]': 'PRODUCT_REGISTER',
-                    'columns[1][searchable]': 'false',
-                    'columns[1][orderable]': 'false',
-                    'columns[2][data]': 'PRODUCT_NAME',
-                    'columns[2][searchable]': 'false',
-                    'columns[2][orderable]': 'false',
-                    'columns[3][data]': 'MANUFACTURER_NAME',
-                    'columns[3][searchable]': 'false',
-                    'columns[3][orderable]': 'false',
-                    'start': '0',
-                    'length': '10',
-                    'search[value]': '',
-                    'search[regex]': 'false',
-                    'query': search_query 
-                }
-                
-                search_headers = self.headers.copy()
-                search_headers.update({
-                    'X-CSRF-TOKEN': csrf_token,
-                    'X-Requested-With': 'XMLHttpRequest',
-                    'Content-Type': 'application/x-www-form-urlencoded; charset=UTF-8',
-                    'Referer': f'{self.base_url}/all-produk',
-                    'Origin': self.base_url,
-                })
-
-                api_url = f'{self.base_url}/produk-dt/all'
-                response = await client.post(api_url, data=post_data, headers=search_headers, cookies=home_response.cookies)
-                
-                if response.status_code == 200:
-                    result = response.json()
-                    if result.get('recordsFiltered', 0) > 0:
-                        raw = result['data'][0]
-                        return self._format_product(raw)
-                
-                return None
-
-            except Exception as e:
-                print(f"Scraper Exception for query '{search_query}': {e}")
-                return None
+                import h2  # noqa: F401
+            except ImportError:
+                print("BPOM_HTTP2 aktif tetapi paket 'h2' belum terpasang, memakai HTTP/1.1")
+                http2 = False
+
+        return httpx.AsyncClient(
+            timeout=settings.BPOM_TIMEOUT,
+            follow_redirects=True,
+            http2=http2,
+            limits=httpx.Limits(
+                max_connections=settings.BPOM_MAX_CONNECTIONS,
+                max_keepalive_connections=settings.BPOM_MAX_CONNECTIONS,
+                keepalive_expiry=30.0
+            )
+        )
+
+    @classmethod
+    async def startup(cls):
+        if cls._client is None:
+            cls._client = cls._build_client()
+
+    @classmethod
+    async def shutdown(cls):
+        if cls._client is not None:
+            await cls._client.aclose()
+        cls._client = None
+        cls._csrf_token = None
+        cls._csrf_expires_at = 0.0
+
+    @classmethod
+    def _get_client(cls) -> httpx.AsyncClient:
+        # Fallback untuk pemakaian di luar lifespan FastAPI (script, shell)
+        if cls._client is None:
+            cls._client = cls._build_client()
+        return cls._client
+
+    def _parse_csrf_token(self, html: str) -> Optional[str]:
+        for tag in CSRF_META_RE.findall(html):
+            content = CSRF_CONTENT_RE.search(tag)
+            if content:
+                return content.group(1)
+
+        soup = BeautifulSoup(html, 'html.parser')
+        csrf_meta = soup.find('meta', {'name': 'csrf-token'})
+        return csrf_meta['content'] if csrf_meta else None
+
+    async def _get_csrf_token(self, client: httpx.AsyncClient, stale_token: Optional[str] = None) -> Optional[str]:
+        """Token + cookie sesi dipakai ulang sampai kedaluwarsa atau ditolak upstream (stale_token)."""
+        cls = type(self)
+
+        def cached():
+            if cls._csrf_token and cls._csrf_token != stale_token and time.monotonic() < cls._csrf_expires_at:
+                return cls._csrf_token
+            return None
+
+        token = cached()
+        if token:
+            return token
+
+        if cls._csrf_lock is None:
+            cls._csrf_lock = asyncio.Lock()
+
+        async with cls._csrf_lock:
+            token = cached()
+            if token:
+                return token
+
+            # Cookie sesi dari halaman utama disimpan di cookie jar client bersama
+            home_response = await client.get(self.base_url, headers=self.headers)
+            token = self._parse_csrf_token(home_response.text)
+            cls._csrf_token = token
+            cls._csrf_expires_at = time.monotonic() + settings.BPOM_CSRF_TTL if token else 0.0
+            return token
+
+    async def _post_search(self, client: httpx.AsyncClient, search_query: str, csrf_token: str) -> httpx.Response:
+        post_data = {
+            'draw': '1',
+            'columns[0][data]': 'PRODUCT_ID',
+            'columns[0][searchable]': 'false',
+            'columns[0][orderable]': 'false',
+            'columns[1][data]': 'PRODUCT_REGISTER',
+            'columns[1][searchable]': 'false',
+            'columns[1][orderable]': 'false',
+            'columns[2][data]': 'PRODUCT_NAME',
+            'columns[2][searchable]': 'false',
+            'columns[2][orderable]': 'false',
+            'columns[3][data]': 'MANUFACTURER_NAME',
+            'columns[3][searchable]': 'false',
+            'columns[3][orderable]': 'false',
+            'start': '0',
+            'length': '10',
+            'search[value]': '',
+            'search[regex]': 'false',
+            'query': search_query 
+        }
+        
+        search_headers = self.headers.copy()
+        search_headers.update({
+            'X-CSRF-TOKEN': csrf_token,
+            'X-Requested-With': 'XMLHttpRequest',
+            'Content-Type': 'application/x-www-form-urlencoded; charset=UTF-8',
+            'Referer': f'{self.base_url}/all-produk',
+            'Origin': self.base_url,
+        })
+
+        api_url = f'{self.base_url}/produk-dt/all'
+        return await client.post(api_url, data=post_data, headers=search_headers)
+
+    async def _perform_request(self, search_query: str) -> Optional[Dict]:
+        """None = produk tidak terdaftar; BPOMUpstreamError = upstream gagal menjawab."""
+        client = self._get_client()
+        try:
+            csrf_token = await self._get_csrf_token(client)
+            if not csrf_token:
+                raise BPOMUpstreamError("CSRF token tidak ditemukan")
+
+            response = await self._post_search(client, search_query, csrf_token)
+
+            if response.status_code in CSRF_REJECTED_STATUSES:
+                csrf_token = await self._get_csrf_token(client, stale_token=csrf_token)
+                if not csrf_token:
+                    raise BPOMUpstreamError("CSRF token tidak ditemukan")
+                response = await self._post_search(client, search_query, csrf_token)
+            
+            if response.status_code != 200:
+                raise BPOMUpstreamError(f"HTTP {response.status_code}")
+
+            result = response.json()
+            if result.get('recordsFiltered', 0) > 0:
+                raw = result['data'][0]
+                return self._format_product(raw)
+            
+            return None
+
+        except BPOMUpstreamError as e:
+            print(f"Scraper upstream error for query '{search_query}': {e}")
+            raise
+        except Exception as e:
+            print(f"Scraper Exception for query '{search_query}': {e}")
+            raise BPOMUpstreamError(str(e)) from e
 
     def _format_product(self, raw: Dict) -> Dict:
         return {
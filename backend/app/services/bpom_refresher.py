@@ -0,0 +1,123 @@
+import asyncio
+import time
+from functools import partial
+from typing import Optional, Set
+from app.core.config import settings
+from app.core.database import AsyncSessionLocal
+from app.crud import scan as crud_scan
+from app.services.bpom_endpoint import BPOMScraper, normalize_bpom_number
+
+class BPOMCacheRefresher:
+    """Memperbarui bpom_cache di background: refresh stale-while-revalidate dan worker periodik
+    untuk entri populer yang mendekati kedaluwarsa. Semua scrape dibatasi semaphore + rate limit."""
+
+    def __init__(self):
+        self._worker: Optional[asyncio.Task] = None
+        self._tasks: Set[asyncio.Task] = set()
+        self._pending: Set[str] = set()
+        self._semaphore: Optional[asyncio.Semaphore] = None
+        self._rate_lock: Optional[asyncio.Lock] = None
+        self._next_slot = 0.0
+        self.scheduled = 0
+        self.refreshed = 0
+        self.failed = 0
+
+    def _ensure_primitives(self):
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(settings.BPOM_REFRESH_CONCURRENCY)
+            self._rate_lock = asyncio.Lock()
+
+    async def start(self):
+        self._ensure_primitives()
+        if settings.BPOM_REFRESHER_ENABLED and self._worker is None:
+            self._worker = asyncio.create_task(self._run())
+
+    async def stop(self):
+        tasks = list(self._tasks)
+        if self._worker is not None:
+            tasks.append(self._worker)
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        self._worker = None
+        self._tasks.clear()
+        self._pending.clear()
+
+    def schedule_refresh(self, bpom_number: str):
+        """Dipanggil saat data stale disajikan; tidak menunggu hasil scrape."""
+        key = normalize_bpom_number(bpom_number)
+        if not key or key in self._pending:
+            return
+
+        self._ensure_primitives()
+        self.scheduled += 1
+        task = asyncio.create_task(self.refresh(bpom_number))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def refresh(self, bpom_number: str):
+        key = normalize_bpom_number(bpom_number)
+        if key in self._pending:
+            return
+        self._pending.add(key)
+
+        try:
+            async with self._semaphore:
+                await self._wait_rate_limit()
+                # None = upstream pasti menjawab "tidak ada" (error upstream di-raise),
+                # jadi data lama dihapus dan diganti negative cache
+                result = await BPOMScraper().search_bpom(
+                    bpom_number, on_result=partial(crud_scan.save_bpom_scrape_result, bpom_number)
+                )
+                if result:
+                    self.refreshed += 1
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            self.failed += 1
+            print(f"BPOM refresh failed for '{bpom_number}': {e}")
+        finally:
+            self._pending.discard(key)
+
+    async def _wait_rate_limit(self):
+        # BPOM_REFRESH_RATE <= 0 berarti tanpa batas (tetap dibatasi BPOM_REFRESH_CONCURRENCY)
+        if settings.BPOM_REFRESH_RATE <= 0:
+            return
+        async with self._rate_lock:
+            now = time.monotonic()
+            wait = self._next_slot - now
+            if wait > 0:
+                await asyncio.sleep(wait)
+            self._next_slot = max(now, self._next_slot) + 1.0 / settings.BPOM_REFRESH_RATE
+
+    async def _run(self):
+        while True:
+            try:
+                await self._refresh_expiring()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                print(f"BPOM refresher error: {e}")
+            await asyncio.sleep(settings.BPOM_REFRESH_INTERVAL)
+
+    async def _refresh_expiring(self):
+        async with AsyncSessionLocal() as db:
+            numbers = await crud_scan.get_bpom_refresh_candidates(
+                db,
+                window_days=settings.BPOM_REFRESH_WINDOW_DAYS,
+                limit=settings.BPOM_REFRESH_BATCH
+            )
+
+        if numbers:
+            await asyncio.gather(*(self.refresh(n) for n in numbers))
+
+    def stats(self) -> dict:
+        return {
+            "running": self._worker is not None and not self._worker.done(),
+            "pending": len(self._pending),
+            "scheduled": self.scheduled,
+            "refreshed": self.refreshed,
+            "failed": self.failed,
+        }
+
+bpom_refresher = BPOMCacheRefresher()
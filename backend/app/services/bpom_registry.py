@@ -0,0 +1,142 @@
+"""Import dump registry produk BPOM ke tabel bpom_registry.
+
+Pemakaian CLI (dari folder backend):
+    python -m app.services.bpom_registry dump.csv --chunk-size 1000
+
+Format yang didukung: CSV, JSON Lines (.jsonl/.ndjson), dan JSON (.json, array atau
+respon DataTables cekbpom {"data": [...]}). Kolom mengikuti nama field cekbpom
+(PRODUCT_REGISTER, PRODUCT_NAME, MANUFACTURER_NAME, ...), tidak peka huruf besar/kecil.
+"""
+import argparse
+import csv
+import json
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, Iterator, List, Optional
+from sqlalchemy import func
+from sqlalchemy.dialects.mysql import insert as mysql_insert
+from sqlalchemy.orm import Session
+from app.crud.scan import REGISTRY_FIELDS
+from app.models.scan import BPOMRegistry
+from app.services.bpom_endpoint import BPOMScraper, normalize_bpom_number
+
+# Status import terakhir di proses ini (dibaca endpoint admin)
+import_status: Dict = {"state": "idle"}
+
+_scraper = BPOMScraper()
+
+def iter_records(path: str) -> Iterator[Dict]:
+    suffix = Path(path).suffix.lower()
+
+    if suffix == ".csv":
+        with open(path, newline="", encoding="utf-8-sig") as f:
+            yield from csv.DictReader(f)
+
+    elif suffix in (".jsonl", ".ndjson"):
+        with open(path, encoding="utf-8") as f:
+            for line in f:
+                line = line.strip()
+                if line:
+                    yield json.loads(line)
+
+    elif suffix == ".json":
+        try:
+            import ijson
+        except ImportError:
+            ijson = None
+
+        with open(path, "rb") as f:
+            if ijson is not None:
+                yield from ijson.items(f, "item")
+            else:
+                # Tanpa ijson file JSON dibaca utuh; pakai JSON Lines untuk dump besar
+                data = json.load(f)
+                if isinstance(data, dict):
+                    data = data.get("data", [])
+                yield from data
+
+    else:
+        raise ValueError("Format file tidak didukung. Gunakan csv, json, atau jsonl.")
+
+def _to_row(raw: Dict) -> Optional[Dict]:
+    raw = {
+        str(k).strip().upper(): (v.strip() if isinstance(v, str) else v)
+        for k, v in raw.items() if k
+    }
+    if not raw.get("PRODUCT_REGISTER"):
+        return None
+
+    product = _scraper._format_product(raw)
+    key = normalize_bpom_number(product["bpom_number"])
+    if not key or len(key) > 50:
+        return None
+
+    row = {"bpom_key": key}
+    columns = BPOMRegistry.__table__.columns
+    for field in REGISTRY_FIELDS:
+        value = product.get(field)
+        if value is not None:
+            value = str(value)
+            max_length = getattr(columns[field].type, "length", None)
+            if max_length:
+                value = value[:max_length]
+        row[field] = value
+    return row
+
+def _flush(db: Session, rows: List[Dict]):
+    stmt = mysql_insert(BPOMRegistry).values(rows)
+    update = {field: stmt.inserted[field] for field in REGISTRY_FIELDS}
+    update["imported_at"] = func.now()
+    db.execute(stmt.on_duplicate_key_update(**update))
+    db.commit()
+
+def import_registry(db: Session, path: str, chunk_size: int = 1000) -> Dict:
+    """Streaming import: baris dibaca satu per satu dan di-upsert per chunk."""
+    stats = {"read": 0, "imported": 0, "skipped": 0}
+    import_status.clear()
+    import_status.update(state="running", started_at=datetime.now().isoformat(), **stats)
+
+    chunk = []
+    try:
+        for raw in iter_records(path):
+            stats["read"] += 1
+            row = _to_row(raw) if isinstance(raw, dict) else None
+            if row is None:
+                stats["skipped"] += 1
+                continue
+
+            chunk.append(row)
+            if len(chunk) >= chunk_size:
+                _flush(db, chunk)
+                stats["imported"] += len(chunk)
+                chunk = []
+                import_status.update(stats)
+
+        if chunk:
+            _flush(db, chunk)
+            stats["imported"] += len(chunk)
+    except Exception as e:
+        db.rollback()
+        import_status.update(state="failed", error=str(e), finished_at=datetime.now().isoformat(), **stats)
+        raise
+
+    import_status.update(state="done", finished_at=datetime.now().isoformat(), **stats)
+    return stats
+
+def main():
+    from app.core.database import SessionLocal
+
+    parser = argparse.ArgumentParser(description="Import dump registry produk BPOM ke tabel bpom_registry")
+    parser.add_argument("path", help="File dump (csv, json, jsonl)")
+    parser.add_argument("--chunk-size", type=int, default=1000)
+    args = parser.parse_args()
+
+    db = SessionLocal()
+    try:
+        stats = import_registry(db, args.path, chunk_size=args.chunk_size)
+    finally:
+        db.close()
+    print(f"Selesai: {stats['imported']} diimport, {stats['skipped']} dilewati dari {stats['read']} baris")
+
+if __name__ == "__main__":
+    main()
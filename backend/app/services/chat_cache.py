@@ -0,0 +1,27 @@
+import hashlib
+import json
+import re
+from app.services.prompts import CHAT_PROMPT_VERSION
+
+_WHITESPACE = re.compile(r"\s+")
+_TRAILING_PUNCTUATION = re.compile(r"[\s?!.,;:]+$")
+
+def canonicalize_context(product_context: str) -> str:
+    """Konteks JSON di-serialize ulang dengan key terurut agar urutan field/spasi tidak mengubah key."""
+    try:
+        return json.dumps(json.loads(product_context), sort_keys=True, separators=(",", ":"), ensure_ascii=False)
+    except (TypeError, ValueError):
+        return _WHITESPACE.sub(" ", product_context or "").strip()
+
+def normalize_question(question: str) -> str:
+    question = _WHITESPACE.sub(" ", question or "").strip().lower()
+    return _TRAILING_PUNCTUATION.sub("", question)
+
+def chat_cache_key(product_context: str, question: str, language: str) -> str:
+    raw = "\n".join([
+        CHAT_PROMPT_VERSION,
+        (language or "id").lower(),
+        canonicalize_context(product_context),
+        normalize_question(question),
+    ])
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
@@ -0,0 +1,118 @@
+import asyncio
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+from io import BytesIO
+from typing import Callable, NamedTuple, Optional
+from PIL import Image, ImageFilter, ImageOps
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+# Decode/resize PIL berat di CPU; jalankan di pool sendiri agar tidak memblokir event loop
+# dan tidak berebut thread default dengan to_thread lain.
+_executor = ThreadPoolExecutor(
+    max_workers=settings.IMAGE_PIPELINE_WORKERS,
+    thread_name_prefix="image-pipeline"
+)
+
+_stats_lock = threading.Lock()
+_stats = {"processed": 0, "original_bytes": 0, "processed_bytes": 0}
+
+class PreprocessedImage(NamedTuple):
+    image: Image.Image
+    data: bytes
+    mime_type: str
+    original_bytes: int
+    processed_bytes: int
+
+def crop_to_label(image: Image.Image) -> Image.Image:
+    """Potong ke area dengan detail tinggi (teks/tabel label), deteksi tepi pada salinan kecil."""
+    small = ImageOps.contain(image, (256, 256)).convert("L")
+    edges = small.filter(ImageFilter.FIND_EDGES).point(lambda p: 255 if p > 40 else 0)
+    # Filter tepi selalu menandai 1px di pinggir gambar; abaikan bingkai tersebut
+    border = 2
+    bbox = edges.crop((border, border, small.width - border, small.height - border)).getbbox()
+    if not bbox:
+        return image
+
+    scale_x = image.width / small.width
+    scale_y = image.height / small.height
+    left, top, right, bottom = (v + border for v in bbox)
+    pad_x = (right - left) * 0.05
+    pad_y = (bottom - top) * 0.05
+    box = (
+        max(int((left - pad_x) * scale_x), 0),
+        max(int((top - pad_y) * scale_y), 0),
+        min(int((right + pad_x) * scale_x), image.width),
+        min(int((bottom + pad_y) * scale_y), image.height),
+    )
+
+    # Area terlalu kecil kemungkinan noise; hampir penuh berarti tidak ada yang perlu dipotong
+    area_ratio = ((box[2] - box[0]) * (box[3] - box[1])) / float(image.width * image.height)
+    if area_ratio < 0.05 or area_ratio > 0.9:
+        return image
+    return image.crop(box)
+
+def preprocess_image(
+    image_bytes: bytes,
+    max_edge: Optional[int] = None,
+    quality: Optional[int] = None,
+    grayscale: Optional[bool] = None,
+    crop: Optional[bool] = None
+) -> PreprocessedImage:
+    max_edge = max_edge or settings.IMAGE_MAX_EDGE
+    quality = quality or settings.IMAGE_JPEG_QUALITY
+    grayscale = settings.IMAGE_GRAYSCALE if grayscale is None else grayscale
+    crop = settings.IMAGE_AUTO_CROP if crop is None else crop
+
+    image = Image.open(BytesIO(image_bytes))
+    # JPEG: decode langsung di skala lebih kecil (sisakan ruang untuk crop)
+    draft_edge = max_edge * 2 if crop else max_edge
+    image.draft("RGB", (draft_edge, draft_edge))
+    image = ImageOps.exif_transpose(image)
+
+    if image.mode not in ("RGB", "L"):
+        image = image.convert("RGB")
+
+    if crop:
+        image = crop_to_label(image)
+
+    image.thumbnail((max_edge, max_edge), Image.LANCZOS)
+
+    if grayscale:
+        image = image.convert("L")
+
+    output = BytesIO()
+    image.save(output, format="JPEG", quality=quality, optimize=True)
+    data = output.getvalue()
+
+    with _stats_lock:
+        _stats["processed"] += 1
+        _stats["original_bytes"] += len(image_bytes)
+        _stats["processed_bytes"] += len(data)
+
+    logger.info(f"Image preprocessed: {len(image_bytes)} -> {len(data)} bytes, {image.size}, {image.mode}")
+    return PreprocessedImage(
+        image=image,
+        data=data,
+        mime_type="image/jpeg",
+        original_bytes=len(image_bytes),
+        processed_bytes=len(data)
+    )
+
+async def run_in_pipeline(fn: Callable, *args, **kwargs):
+    """Jalankan kerja PIL lain (mis. hash gambar) di pool yang sama, bukan di event loop."""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(_executor, partial(fn, *args, **kwargs))
+
+async def preprocess_image_async(image_bytes: bytes, **kwargs) -> PreprocessedImage:
+    return await run_in_pipeline(preprocess_image, image_bytes, **kwargs)
+
+def get_pipeline_stats() -> dict:
+    with _stats_lock:
+        stats = dict(_stats)
+    if stats["original_bytes"]:
+        stats["size_ratio"] = round(stats["processed_bytes"] / stats["original_bytes"], 4)
+    return stats
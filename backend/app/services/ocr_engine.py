@@ -0,0 +1,307 @@
+"""Ekstraksi tabel Informasi Nilai Gizi secara lokal dengan Tesseract (tanpa Gemini).
+
+Tesseract dijalankan di process pool (ocr_pool): pekerjaan OCR berat di CPU dan pytesseract
+memanggil binary eksternal, jadi tidak boleh berjalan di event loop maupun di thread pool default.
+Pool yang sama dipakai /api/scan/ocr-text.
+"""
+import asyncio
+import multiprocessing
+import re
+import time
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from statistics import median
+from typing import Callable, Dict, List, NamedTuple, Optional
+from app.core.config import settings
+
+OCR_LANG = "ind+eng"
+
+# Field inti yang menentukan confidence; sisanya opsional
+CORE_FIELDS = ("calories", "protein", "fat", "carbs", "sugar", "sodium")
+
+HEADER_PATTERN = re.compile(r"informasi\s+nilai\s+gizi|nutrition\s+facts|nilai\s+gizi", re.IGNORECASE)
+
+# Jika dua pola cocok di posisi yang sama, yang lebih awal di daftar (lebih spesifik) menang
+LABEL_PATTERNS = [
+    ("skip", re.compile(r"lemak\s+jenuh|lemak\s+trans|saturated|trans\s+fat|energi\s+dari\s+lemak|energy\s+from\s+fat|kolesterol|cholesterol", re.IGNORECASE)),
+    ("calories", re.compile(r"energi(\s+total)?|energy|kalori|calories", re.IGNORECASE)),
+    ("protein", re.compile(r"protein", re.IGNORECASE)),
+    ("fat", re.compile(r"lemak(\s+total)?|total\s+fat|\bfat\b", re.IGNORECASE)),
+    ("carbs", re.compile(r"karbohidrat(\s+total)?|total\s+carbohydrate|carbohydrate", re.IGNORECASE)),
+    ("sugar", re.compile(r"\bgula\b|sugars?", re.IGNORECASE)),
+    ("fiber", re.compile(r"serat(\s+pangan)?|dietary\s+fiber|\bfiber\b", re.IGNORECASE)),
+    ("sodium", re.compile(r"natrium|sodium", re.IGNORECASE)),
+    # "Garam (Natrium) 830 mg" adalah natrium, bukan garam
+    ("salt", re.compile(r"\bgaram\b(?!\s*\(\s*(natrium|sodium))|\bsalt\b", re.IGNORECASE)),
+]
+
+# Angka + satuan; angka yang diikuti % (persen AKG) tidak cocok karena satuan wajib ada
+VALUE_PATTERN = re.compile(r"(\d+(?:[.,]\d+)?)\s*(kkal|kcal|kal|kj|mg|g)\b", re.IGNORECASE)
+
+# Batas wajar per sajian; nilai di luar ini dianggap salah baca
+MAX_VALUES = {"calories": 2000, "protein": 100, "fat": 100, "carbs": 200, "sugar": 150, "fiber": 100, "sodium": 10000}
+
+class LocalExtraction(NamedTuple):
+    nutrition: Dict[str, float]
+    confidence: float
+    header_found: bool
+
+def _to_number(raw: str) -> float:
+    return float(raw.replace(",", "."))
+
+def _normalize(field: str, value: float, unit: str) -> Optional[float]:
+    unit = unit.lower()
+    if field == "calories":
+        if unit == "kj":
+            value = value / 4.184
+        elif unit not in ("kkal", "kcal", "kal"):
+            return None
+    elif field in ("sodium", "salt"):
+        if unit == "g":
+            value = value * 1000
+        elif unit != "mg":
+            return None
+        if field == "salt":
+            # Garam (NaCl) ~40% natrium
+            value = value * 0.4
+    else:
+        if unit == "mg":
+            value = value / 1000
+        elif unit != "g":
+            return None
+    return round(value, 1)
+
+def _group_rows(data: Dict) -> List[Dict]:
+    """Kelompokkan kata per baris visual (berdasarkan posisi vertikal), bukan per baris Tesseract,
+    karena kolom label dan nilai sering terbaca sebagai blok terpisah."""
+    words = []
+    for i, text in enumerate(data["text"]):
+        text = (text or "").strip()
+        try:
+            conf = float(data["conf"][i])
+        except (TypeError, ValueError):
+            conf = -1
+        if not text or conf < 0:
+            continue
+        words.append({
+            "text": text,
+            "conf": conf,
+            "left": data["left"][i],
+            "center": data["top"][i] + data["height"][i] / 2,
+            "height": data["height"][i],
+        })
+    if not words:
+        return []
+
+    tolerance = median(w["height"] for w in words) * 0.6
+    rows = []
+    for word in sorted(words, key=lambda w: w["center"]):
+        if rows and abs(rows[-1]["center"] - word["center"]) <= tolerance:
+            row = rows[-1]
+            row["words"].append(word)
+            row["center"] = sum(w["center"] for w in row["words"]) / len(row["words"])
+        else:
+            rows.append({"center": word["center"], "words": [word]})
+
+    result = []
+    for row in rows:
+        ordered = sorted(row["words"], key=lambda w: w["left"])
+        result.append({
+            "text": " ".join(w["text"] for w in ordered),
+            "conf": sum(w["conf"] for w in ordered) / len(ordered),
+        })
+    return result
+
+def parse_nutrition_table(data: Dict) -> LocalExtraction:
+    """Parse output image_to_data (dict) menjadi nilai gizi ternormalisasi
+    (kkal, gram, natrium dalam mg) + skor confidence 0-1."""
+    rows = _group_rows(data)
+
+    start = 0
+    header_found = False
+    for i, row in enumerate(rows):
+        if HEADER_PATTERN.search(row["text"]):
+            start, header_found = i + 1, True
+            break
+
+    nutrition: Dict[str, float] = {}
+    confidences: List[float] = []
+    for row in rows[start:]:
+        # Label yang muncul paling awal di baris yang dipakai; seri -> urutan LABEL_PATTERNS
+        matches = [(m.start(), order, field, m) for order, (field, pattern) in enumerate(LABEL_PATTERNS)
+                   for m in [pattern.search(row["text"])] if m]
+        if not matches:
+            continue
+        _, _, field, match = min(matches, key=lambda item: item[:2])
+        if field == "skip":
+            continue
+
+        value_match = VALUE_PATTERN.search(row["text"], match.end())
+        if value_match:
+            value = _normalize(field, _to_number(value_match.group(1)), value_match.group(2))
+            target = "sodium" if field == "salt" else field
+            if value is not None and value <= MAX_VALUES[target] and target not in nutrition:
+                nutrition[target] = value
+                confidences.append(row["conf"])
+
+    found = sum(1 for field in CORE_FIELDS if field in nutrition)
+    coverage = found / len(CORE_FIELDS)
+    ocr_quality = min(sum(confidences) / len(confidences) / 90.0, 1.0) if confidences else 0.0
+    confidence = coverage * ocr_quality * (1.0 if header_found else 0.8)
+    return LocalExtraction(nutrition=nutrition, confidence=round(confidence, 3), header_found=header_found)
+
+class LocalOCRError(Exception):
+    pass
+
+class OCRBusyError(Exception):
+    """Semua worker sibuk dan antrean penuh."""
+
+def _run_tesseract(image_bytes: bytes, method: str, **kwargs):
+    import pytesseract
+    from app.services.image_pipeline import preprocess_image
+
+    try:
+        processed = preprocess_image(image_bytes, max_edge=settings.IMAGE_OCR_MAX_EDGE, grayscale=True)
+        # timeout pytesseract membunuh proses tesseract-nya, bukan hanya berhenti menunggu
+        return getattr(pytesseract, method)(
+            processed.image, lang=OCR_LANG, timeout=settings.OCR_JOB_TIMEOUT, **kwargs
+        )
+    except Exception as e:
+        # Beberapa exception pytesseract tidak bisa di-pickle dan akan merusak pool
+        raise LocalOCRError(f"{type(e).__name__}: {e}") from None
+
+def extract_text(image_bytes: bytes) -> str:
+    """Dijalankan di proses worker."""
+    return _run_tesseract(image_bytes, "image_to_string").strip()
+
+def extract_nutrition_table(image_bytes: bytes) -> LocalExtraction:
+    """Dijalankan di proses worker."""
+    import pytesseract
+    data = _run_tesseract(image_bytes, "image_to_data", output_type=pytesseract.Output.DICT)
+    return parse_nutrition_table(data)
+
+def _timed(fn: Callable, image_bytes: bytes):
+    started = time.perf_counter()
+    result = fn(image_bytes)
+    return result, time.perf_counter() - started
+
+def _warmup() -> bool:
+    """Import pytesseract di worker dan jalankan tesseract sekali agar traineddata sudah di page cache."""
+    import pytesseract
+    from PIL import Image
+    try:
+        pytesseract.image_to_string(Image.new("L", (32, 32), 255), lang=OCR_LANG, timeout=30)
+        return True
+    except Exception:
+        return False
+
+class OCRWorkerPool:
+    """Process pool ukuran tetap untuk Tesseract dengan antrean terbatas. Job yang masuk saat
+    worker + antrean penuh ditolak (OCRBusyError) alih-alih menumpuk tanpa batas."""
+
+    def __init__(self):
+        self._executor: Optional[ProcessPoolExecutor] = None
+        self.pending = 0
+        self.max_pending_seen = 0
+        self.completed = 0
+        self.failed = 0
+        self.rejected = 0
+        self.timeouts = 0
+        self.total_run_time = 0.0
+        self.max_run_time = 0.0
+        self.total_latency = 0.0
+
+    @property
+    def capacity(self) -> int:
+        return settings.OCR_WORKERS + settings.OCR_QUEUE_SIZE
+
+    def _get_executor(self) -> ProcessPoolExecutor:
+        if self._executor is None:
+            # spawn: worker tidak mewarisi thread/koneksi (DB, httpx) dari proses server
+            self._executor = ProcessPoolExecutor(
+                max_workers=settings.OCR_WORKERS,
+                mp_context=multiprocessing.get_context("spawn")
+            )
+        return self._executor
+
+    def start(self):
+        executor = self._get_executor()
+        for _ in range(settings.OCR_WORKERS):
+            executor.submit(_warmup)
+
+    def shutdown(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+    async def run(self, fn: Callable, image_bytes: bytes):
+        if self.pending >= self.capacity:
+            self.rejected += 1
+            raise OCRBusyError("Server OCR sedang sibuk. Coba lagi beberapa saat.")
+
+        self.pending += 1
+        self.max_pending_seen = max(self.max_pending_seen, self.pending)
+        started = time.monotonic()
+        loop = asyncio.get_running_loop()
+        try:
+            future = loop.run_in_executor(self._get_executor(), _timed, fn, image_bytes)
+            # Batas total termasuk waktu antre; tesseract sendiri dibatasi OCR_JOB_TIMEOUT di worker
+            result, run_time = await asyncio.wait_for(future, timeout=settings.OCR_JOB_TIMEOUT * 2)
+        except asyncio.TimeoutError:
+            self.timeouts += 1
+            raise
+        except BrokenProcessPool:
+            # Worker mati (OOM/segfault tesseract): buang pool agar job berikutnya membuat yang baru
+            self.failed += 1
+            self.shutdown()
+            raise
+        except Exception:
+            self.failed += 1
+            raise
+        finally:
+            self.pending -= 1
+
+        self.completed += 1
+        self.total_run_time += run_time
+        self.max_run_time = max(self.max_run_time, run_time)
+        self.total_latency += time.monotonic() - started
+        return result
+
+    def stats(self) -> dict:
+        return {
+            "workers": settings.OCR_WORKERS,
+            "capacity": self.capacity,
+            "pending": self.pending,
+            "queue_depth": max(self.pending - settings.OCR_WORKERS, 0),
+            "max_pending": self.max_pending_seen,
+            "completed": self.completed,
+            "failed": self.failed,
+            "rejected": self.rejected,
+            "timeouts": self.timeouts,
+            "avg_run_ms": round(self.total_run_time / self.completed * 1000, 1) if self.completed else 0.0,
+            "max_run_ms": round(self.max_run_time * 1000, 1),
+            "avg_latency_ms": round(self.total_latency / self.completed * 1000, 1) if self.completed else 0.0,
+        }
+
+ocr_pool = OCRWorkerPool()
+
+fast_path_stats = {"attempts": 0, "accepted": 0, "low_confidence": 0, "failed": 0}
+
+async def try_fast_path(image_bytes: bytes) -> Optional[LocalExtraction]:
+    """Hasil ekstraksi lokal jika confidence cukup; None berarti lanjut ke Gemini."""
+    fast_path_stats["attempts"] += 1
+    try:
+        extraction = await ocr_pool.run(extract_nutrition_table, image_bytes)
+    except Exception as e:
+        fast_path_stats["failed"] += 1
+        print(f"Local OCR failed: {type(e).__name__}: {e}")
+        return None
+
+    if extraction.confidence < settings.OCR_FAST_PATH_MIN_CONFIDENCE:
+        fast_path_stats["low_confidence"] += 1
+        return None
+    fast_path_stats["accepted"] += 1
+    return extraction
+
+def get_fast_path_stats() -> dict:
+    return dict(fast_path_stats, min_confidence=settings.OCR_FAST_PATH_MIN_CONFIDENCE)
@@ -0,0 +1,175 @@
+import json
+from typing import Dict, NamedTuple, Tuple
+from google.genai import types
+from app.core.config import settings
+from app.schemas.scan import NutritionAnalysis
+
+# Naikkan setiap kali prompt/parsing analisis berubah agar cache hasil lama tidak dipakai
+ANALYSIS_PROMPT_VERSION = "v3"
+CHAT_PROMPT_VERSION = "v1"
+
+DEFAULT_LANGUAGE = "id"
+
+# Teks per bahasa. Menambah bahasa cukup dengan menambah entri di sini.
+LANGUAGES: Dict[str, Dict] = {
+    "id": {
+        "name": "Indonesia",
+        "prompt_header": "Analisis label nutrisi produk ini secara profesional.",
+        "output_instruction": "OUTPUT HARUS JSON VALID TANPA MARKDOWN:",
+        "rules_title": "ATURAN PENTING:",
+        "summary_desc": "2-3 kalimat analisis objektif",
+        "pros_desc": "2-3 keunggulan nutrisi",
+        "cons_desc": "2-3 kekurangan nutrisi",
+        "warnings_desc": '["Tinggi Gula", "Tinggi Garam", "Pemanis Buatan", "Pengawet", dll]',
+        "required_fill": "WAJIB mengisi SEMUA field dengan nilai yang valid.",
+        "example_summary": "Produk ini memiliki kandungan gula yang cukup tinggi dan rendah serat. Cocok sebagai camilan sesekali namun tidak disarankan untuk konsumsi rutin.",
+        "example_pros": ["Mengandung kalsium", "Rendah kolesterol"],
+        "example_cons": ["Tinggi gula", "Rendah serat", "Sodium cukup tinggi"],
+        "example_ingredients": "Tepung terigu, gula, minyak sawit, susu bubuk, perisa vanila",
+        "example_warnings": ["Tinggi Gula", "Mengandung Gluten"],
+        "analysis_request": "Analisis label nutrisi pada gambar ini.",
+        "repair_request": "Respon berikut bukan JSON valid sesuai format yang diminta. Perbaiki dan balas hanya dengan JSON-nya.",
+        "local_summary": "Nilai gizi dibaca langsung dari tabel Informasi Nilai Gizi pada kemasan.",
+    },
+    "en": {
+        "name": "English",
+        "prompt_header": "Professionally analyze the nutrition label of this product.",
+        "output_instruction": "OUTPUT MUST BE VALID JSON WITHOUT MARKDOWN:",
+        "rules_title": "IMPORTANT RULES:",
+        "summary_desc": "2-3 sentences of objective analysis",
+        "pros_desc": "2-3 nutritional advantages",
+        "cons_desc": "2-3 nutritional disadvantages",
+        "warnings_desc": '["High Sugar", "High Salt", "Artificial Sweeteners", "Preservatives", etc.]',
+        "required_fill": "MUST fill ALL fields with valid values.",
+        "example_summary": "This product has a relatively high sugar content and is low in fiber. Suitable as an occasional snack but not recommended for routine consumption.",
+        "example_pros": ["Contains calcium", "Low cholesterol"],
+        "example_cons": ["High sugar", "Low fiber", "Fairly high sodium"],
+        "example_ingredients": "Wheat flour, sugar, palm oil, milk powder, vanilla flavor",
+        "example_warnings": ["High Sugar", "Contains Gluten"],
+        "analysis_request": "Analyze the nutrition label in this image.",
+        "repair_request": "The following response is not valid JSON in the requested format. Fix it and reply with the JSON only.",
+        "local_summary": "Nutrition values were read directly from the nutrition facts table on the package.",
+    },
+}
+
+ANALYSIS_SYSTEM_TEMPLATE = """{prompt_header}
+
+{output_instruction}
+
+{{
+    "nutrition": {{
+        "calories": 200,
+        "protein": 5.2,
+        "fat": 8.5,
+        "carbs": 35.0,
+        "sugar": 18.5,
+        "sodium": 180,
+        "fiber": 2.5,
+        "cholesterol": 10,
+        "calcium": 120,
+        "iron": 3,
+        "potassium": 250
+    }},
+    "health_score": 68,
+    "grade": "C",
+    "summary": {example_summary},
+    "pros": {example_pros},
+    "cons": {example_cons},
+    "ingredients": {example_ingredients},
+    "warnings": {example_warnings}
+}}
+
+{rules_title}
+- Baca SEMUA angka dengan teliti
+- health_score: 0-100 (100=very healthy, 0=unhealthy)
+  - >80: Grade A (Sangat Baik)
+  - 65-80: Grade B (Baik)
+  - 50-64: Grade C (Cukup)
+  - 35-49: Grade D (Kurang)
+  - <35: Grade E (Buruk)
+- Kriteria scoring:
+  - Kurangi score untuk: gula tinggi (>15g), sodium tinggi (>400mg), lemak jenuh tinggi
+  - Tambah score untuk: protein tinggi, serat tinggi, vitamin lengkap
+- summary: {summary_desc}
+- pros: {pros_desc}
+- cons: {cons_desc}
+- warnings: {warnings_desc}
+- Jika data tidak terbaca, estimasi berdasarkan jenis produk yang terlihat
+
+{required_fill}"""
+
+CHAT_SYSTEM_TEMPLATE = "Jawab singkat (max 3 kalimat), edukatif, tanpa bold/italic. Jawab dalam bahasa {name}."
+
+CHAT_USER_TEMPLATE = """Konteks Produk: {product_context}
+
+Pertanyaan: "{user_question}\""""
+
+def language_pack(language: str) -> Dict:
+    language = (language or DEFAULT_LANGUAGE).split("-")[0].lower()
+    return LANGUAGES.get(language, LANGUAGES[DEFAULT_LANGUAGE])
+
+class CompiledPrompt(NamedTuple):
+    version: str
+    config: types.GenerateContentConfig
+    user_template: str
+
+    def render(self, **values) -> str:
+        return self.user_template.format(**values) if values else self.user_template
+
+def _analysis_config(pack: Dict) -> types.GenerateContentConfig:
+    # Contoh di-encode sebagai JSON agar contoh output di prompt juga JSON valid
+    values = dict(pack)
+    for field in ("example_summary", "example_pros", "example_cons", "example_ingredients", "example_warnings"):
+        values[field] = json.dumps(pack[field], ensure_ascii=False)
+
+    options = {"system_instruction": ANALYSIS_SYSTEM_TEMPLATE.format(**values)}
+    if settings.GEMINI_STRUCTURED_OUTPUT:
+        options.update(response_mime_type="application/json", response_schema=NutritionAnalysis)
+    return types.GenerateContentConfig(**options)
+
+def _compile_analysis(pack: Dict) -> CompiledPrompt:
+    return CompiledPrompt(
+        version=ANALYSIS_PROMPT_VERSION,
+        config=_analysis_config(pack),
+        user_template=pack["analysis_request"]
+    )
+
+def _compile_analysis_repair(pack: Dict) -> CompiledPrompt:
+    return CompiledPrompt(
+        version=ANALYSIS_PROMPT_VERSION,
+        config=_analysis_config(pack),
+        user_template=pack["repair_request"] + "\n\n{response_text}"
+    )
+
+def _compile_chat(pack: Dict) -> CompiledPrompt:
+    return CompiledPrompt(
+        version=CHAT_PROMPT_VERSION,
+        config=types.GenerateContentConfig(system_instruction=CHAT_SYSTEM_TEMPLATE.format(**pack)),
+        user_template=CHAT_USER_TEMPLATE
+    )
+
+_COMPILERS = {
+    "analysis": (ANALYSIS_PROMPT_VERSION, _compile_analysis),
+    "analysis_repair": (ANALYSIS_PROMPT_VERSION, _compile_analysis_repair),
+    "chat": (CHAT_PROMPT_VERSION, _compile_chat),
+}
+
+class PromptRegistry:
+    """Semua template (task, bahasa, versi) di-compile sekali saat startup. Rubrik statis
+    dikirim sebagai system_instruction; per request hanya bagian dinamis yang dirender."""
+
+    def __init__(self):
+        self._prompts: Dict[Tuple[str, str, str], CompiledPrompt] = {}
+        for task, (version, compile_fn) in _COMPILERS.items():
+            for language, pack in LANGUAGES.items():
+                self._prompts[(task, language, version)] = compile_fn(pack)
+
+    def get(self, task: str, language: str, version: str = None) -> CompiledPrompt:
+        version = version or _COMPILERS[task][0]
+        language = (language or DEFAULT_LANGUAGE).split("-")[0].lower()
+        prompt = self._prompts.get((task, language, version))
+        if prompt is None:
+            prompt = self._prompts[(task, DEFAULT_LANGUAGE, version)]
+        return prompt
+
+prompt_registry = PromptRegistry()
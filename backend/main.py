@@ -1,3 +1,4 @@
+from contextlib import asynccontextmanager
 from fastapi import FastAPI
 from fastapi.staticfiles import StaticFiles
 from fastapi.middleware.cors import CORSMiddleware
@@ -6,9 +7,25 @@ from slowapi.errors import RateLimitExceeded
 from app.core.config import settings
 from app.core.limiter import limiter 
 from app.routers import auth, users, food, scan, education, favorites, admin
+from app.services.bpom_endpoint import BPOMScraper
+from app.services.bpom_refresher import bpom_refresher
+from app.services.ai_service import GeminiService
+from app.services import ocr_engine
 import os
 
-app = FastAPI(title=settings.PROJECT_NAME, version=settings.PROJECT_VERSION)
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    app.state.gemini_service = GeminiService()
+    await BPOMScraper.startup()
+    await bpom_refresher.start()
+    ocr_engine.ocr_pool.start()
+    yield
+    await bpom_refresher.stop()
+    await BPOMScraper.shutdown()
+    await app.state.gemini_service.close()
+    ocr_engine.ocr_pool.shutdown()
+
+app = FastAPI(title=settings.PROJECT_NAME, version=settings.PROJECT_VERSION, lifespan=lifespan)
 
 app.state.limiter = limiter
 app.add_exception_handler(RateLimitExceeded, _rate_limit_exceeded_handler)
@@ -22,8 +39,8 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-os.makedirs("uploads", exist_ok=True)
-app.mount("/api/uploads", StaticFiles(directory="uploads"), name="api-uploads")
+os.makedirs(settings.UPLOAD_DIR, exist_ok=True)
+app.mount("/api/uploads", StaticFiles(directory=settings.UPLOAD_DIR), name="api-uploads")
 
 app.include_router(auth.router)
 app.include_router(scan.router)
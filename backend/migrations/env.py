@@ -0,0 +1,59 @@
+"""Environment Alembic: metadata dari app.models, URL dari app.core.config.
+
+URL lain bisa diberikan lewat -x, mis. untuk membuat revisi terhadap database kosong:
+    python -m app.migrate -x url=sqlite:///tmp.db revision --autogenerate -m "..."
+"""
+from logging.config import fileConfig
+from alembic import context
+from sqlalchemy import create_engine, pool
+from app.core.config import settings
+from app.core.database import Base
+# Import semua modul model agar tabelnya terdaftar di Base.metadata
+from app.models import education, favorite, food, scan, user  # noqa: F401
+
+config = context.config
+if config.config_file_name is not None:
+    fileConfig(config.config_file_name, disable_existing_loggers=False)
+
+target_metadata = Base.metadata
+
+def _database_url() -> str:
+    return context.get_x_argument(as_dictionary=True).get("url") or settings.DATABASE_URL
+
+def include_object(obj, name, type_, reflected, compare_to):
+    # Tabel yang ada di database tapi tidak punya model tidak boleh ikut di-drop autogenerate
+    if type_ == "table" and reflected and compare_to is None:
+        return False
+    return True
+
+def run_migrations_offline():
+    """--sql: tulis DDL ke stdout untuk dijalankan manual oleh DBA."""
+    context.configure(
+        url=_database_url(),
+        target_metadata=target_metadata,
+        literal_binds=True,
+        dialect_opts={"paramstyle": "named"},
+        compare_type=True,
+        include_object=include_object,
+    )
+    with context.begin_transaction():
+        context.run_migrations()
+
+def run_migrations_online():
+    engine = create_engine(_database_url(), poolclass=pool.NullPool)
+    with engine.connect() as connection:
+        context.configure(
+            connection=connection,
+            target_metadata=target_metadata,
+            compare_type=True,
+            include_object=include_object,
+            # DDL MySQL auto-commit; satu transaksi per revisi agar versi tercatat per langkah
+            transaction_per_migration=True,
+        )
+        with context.begin_transaction():
+            context.run_migrations()
+
+if context.is_offline_mode():
+    run_migrations_offline()
+else:
+    run_migrations_online()
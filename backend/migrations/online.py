@@ -0,0 +1,84 @@
+"""Helper migrasi online untuk MySQL/MariaDB, dipakai dari file di migrations/versions.
+
+ALTER TABLE biasa bisa menyalin ulang dan mengunci tabel. Helper di sini selalu meminta
+ALGORITHM=INPLACE, LOCK=NONE: bila operasi tidak bisa dilakukan online, server menolak
+dengan error alih-alih diam-diam mengunci tabel di production. Isi data ulang dikerjakan
+per rentang primary key dengan commit per batch agar tidak ada transaksi panjang.
+
+Di dialect lain (mis. SQLite untuk pengembangan) helper jatuh ke operasi Alembic biasa.
+"""
+import time
+from typing import Optional, Sequence
+import sqlalchemy as sa
+from alembic import context, op
+from sqlalchemy.schema import CreateColumn
+
+ONLINE = "ALGORITHM=INPLACE, LOCK=NONE"
+
+def _is_mysql() -> bool:
+    return op.get_context().dialect.name in ("mysql", "mariadb")
+
+def _column_list(columns: Sequence[str]) -> str:
+    return ", ".join(f"`{c}`" for c in columns)
+
+def add_index(name: str, table: str, columns: Sequence[str], unique: bool = False):
+    if not _is_mysql():
+        op.create_index(name, table, list(columns), unique=unique)
+        return
+    kind = "UNIQUE KEY" if unique else "KEY"
+    op.execute(f"ALTER TABLE `{table}` ADD {kind} `{name}` ({_column_list(columns)}), {ONLINE}")
+
+def drop_index(name: str, table: str):
+    if not _is_mysql():
+        op.drop_index(name, table_name=table)
+        return
+    op.execute(f"ALTER TABLE `{table}` DROP KEY `{name}`, {ONLINE}")
+
+def add_column(table: str, column: sa.Column):
+    """Kolom baru sebaiknya nullable/ber-default; isi nilainya dengan batched_backfill."""
+    if not _is_mysql():
+        op.add_column(table, column)
+        return
+    ddl = CreateColumn(column).compile(dialect=op.get_context().dialect)
+    op.execute(f"ALTER TABLE `{table}` ADD COLUMN {ddl}, {ONLINE}")
+
+def drop_column(table: str, column: str):
+    if not _is_mysql():
+        op.drop_column(table, column)
+        return
+    op.execute(f"ALTER TABLE `{table}` DROP COLUMN `{column}`, {ONLINE}")
+
+def batched_backfill(
+    table: str,
+    set_clause: str,
+    where: Optional[str] = None,
+    batch_size: int = 1000,
+    key: str = "id",
+    pause: float = 0.0
+):
+    """UPDATE per rentang `key` (default id), commit tiap batch. set_clause/where berupa SQL, mis.
+        batched_backfill("scan_history_ocr", "grade = 'E'", "grade IS NULL AND health_score < 35")
+    pause (detik) memberi jeda antar batch agar replika sempat mengejar."""
+    condition = f" AND ({where})" if where else ""
+    if context.is_offline_mode():
+        # Mode --sql tidak bisa membaca rentang id; DBA menjalankan UPDATE ini sendiri per batch
+        op.execute(f"UPDATE `{table}` SET {set_clause} WHERE 1=1{condition}")
+        return
+
+    statement = sa.text(
+        f"UPDATE `{table}` SET {set_clause} WHERE `{key}` >= :start AND `{key}` < :end{condition}"
+    )
+    with op.get_context().autocommit_block():
+        bind = op.get_bind()
+        low, high = bind.execute(sa.text(f"SELECT MIN(`{key}`), MAX(`{key}`) FROM `{table}`")).one()
+        if low is None:
+            return
+
+        updated = 0
+        start = low
+        while start <= high:
+            updated += bind.execute(statement, {"start": start, "end": start + batch_size}).rowcount
+            start += batch_size
+            if pause:
+                time.sleep(pause)
+        print(f"Backfill {table}: {updated} baris diperbarui")
@@ -0,0 +1,316 @@
+"""Baseline: skema dari app.models, setara database/schema.sql + database/migrations/001-007.
+
+Revision ID: 0001
+Revises: 
+Create Date: 2026-10-18 08:45:37.720232
+
+Database yang sudah berjalan tidak menjalankan revisi ini, cukup ditandai:
+    python -m app.migrate stamp 0001
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+revision = '0001'
+down_revision = None
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('additives',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('name', sa.String(length=100), nullable=False),
+    sa.Column('code', sa.String(length=20), nullable=True),
+    sa.Column('category', sa.String(length=50), nullable=True),
+    sa.Column('safety_level', sa.Enum('safe', 'moderate', 'avoid', name='additivesafety'), nullable=True),
+    sa.Column('description', sa.Text(), nullable=True),
+    sa.Column('health_risks', sa.Text(), nullable=True),
+    sa.Column('created_at', sa.DateTime(timezone=True), server_default=sa.func.now(), nullable=True),
+    sa.PrimaryKeyConstraint('id'),
+    sa.UniqueConstraint('name')
+    )
+    op.create_index(op.f('ix_additives_id'), 'additives', ['id'], unique=False)
+    op.create_table('bpom_cache',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('bpom_number', sa.String(length=50), nullable=False),
+    sa.Column('data', sa.JSON(), nullable=False),
+    sa.Column('last_updated', sa.DateTime(timezone=True), server_default=sa.func.now(), nullable=True),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index(op.f('ix_bpom_cache_bpom_number'), 'bpom_cache', ['bpom_number'], unique=True)
+    op.create_index(op.f('ix_bpom_cache_id'), 'bpom_cache', ['id'], unique=False)
+    op.create_table('bpom_negative_cache',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('bpom_number', sa.String(length=50), nullable=False),
+    sa.Column('last_checked', sa.DateTime(timezone=True), server_default=sa.func.now(), nullable=True),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index(op.f('ix_bpom_negative_cache_bpom_number'), 'bpom_negative_cache', ['bpom_number'], unique=True)
+    op.create_index(op.f('ix_bpom_negative_cache_id'), 'bpom_negative_cache', ['id'], unique=False)
+    op.create_table('bpom_registry',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('bpom_key', sa.String(length=50), nullable=False),
+    sa.Column('bpom_number', sa.String(length=50), nullable=False),
+    sa.Column('product_name', sa.String(length=255), nullable=True),
+    sa.Column('brand', sa.String(length=255), nullable=True),
+    sa.Column('manufacturer', sa.String(length=255), nullable=True),
+    sa.Column('address', sa.Text(), nullable=True),
+    sa.Column('issued_date', sa.String(length=50), nullable=True),
+    sa.Column('expired_date', sa.String(length=50), nullable=True),
+    sa.Column('composition', sa.Text(), nullable=True),
+    sa.Column('packaging', sa.String(length=255), nullable=True),
+    sa.Column('status', sa.String(length=50), nullable=True),
+    sa.Column('qr_code', sa.String(length=255), nullable=True),
+    sa.Column('imported_at', sa.DateTime(timezone=True), server_default=sa.func.now(), nullable=True),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index(op.f('ix_bpom_registry_bpom_key'), 'bpom_registry', ['bpom_key'], unique=True)
+    op.create_index(op.f('ix_bpom_registry_id'), 'bpom_registry', ['id'], unique=False)
+    op.create_table('chat_answer_cache',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('cache_key', sa.String(length=64), nullable=False),
+    sa.Column('language', sa.String(length=10), nullable=False),
+    sa.Column('answer', sa.Text(), nullable=False),
+    sa.Column('created_at', sa.DateTime(timezone=True), server_default=sa.func.now(), nullable=True),
+    sa.PrimaryKeyConstraint('id'),
+    sa.UniqueConstraint('cache_key')
+    )
+    op.create_index(op.f('ix_chat_answer_cache_id'), 'chat_answer_cache', ['id'], unique=False)
+    op.create_table('diseases',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('name', sa.String(length=100), nullable=False),
+    sa.Column('description', sa.Text(), nullable=True),
+    sa.Column('dietary_recommendations', sa.Text(), nullable=True),
+    sa.Column('foods_to_avoid', sa.Text(), nullable=True),
+    sa.Column('created_at', sa.DateTime(timezone=True), server_default=sa.func.now(), nullable=True),
+    sa.PrimaryKeyConstraint('id'),
+    sa.UniqueConstraint('name')
+    )
+    op.create_index(op.f('ix_diseases_id'), 'diseases', ['id'], unique=False)
+    op.create_table('education_articles',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('title', sa.String(length=255), nullable=False),
+    sa.Column('slug', sa.String(length=255), nullable=False),
+    sa.Column('category', sa.Enum('gizi', 'aditif', 'penyakit', 'label', 'tips', name='articlecategory'), nullable=False),
+    sa.Column('content', sa.Text(), nullable=False),
+    sa.Column('author', sa.String(length=100), nullable=True),
+    sa.Column('thumbnail_url', sa.Text(), nullable=True),
+    sa.Column('read_time', sa.String(length=20), server_default='5 min', nullable=True),
+    sa.Column('view_count', sa.Integer(), nullable=True),
+    sa.Column('is_published', sa.Integer(), nullable=True),
+    sa.Column('created_at', sa.DateTime(timezone=True), server_default=sa.func.now(), nullable=True),
+    sa.Column('updated_at', sa.DateTime(timezone=True), nullable=True),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index(op.f('ix_education_articles_id'), 'education_articles', ['id'], unique=False)
+    op.create_index(op.f('ix_education_articles_slug'), 'education_articles', ['slug'], unique=True)
+    op.create_table('food_catalog',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('original_code', sa.String(length=20), nullable=True),
+    sa.Column('name', sa.String(length=255), nullable=False),
+    sa.Column('weight_g', sa.DECIMAL(precision=10, scale=2), nullable=True),
+    sa.Column('calories', sa.DECIMAL(precision=10, scale=2), nullable=True),
+    sa.Column('protein', sa.DECIMAL(precision=10, scale=2), nullable=True),
+    sa.Column('fat', sa.DECIMAL(precision=10, scale=2), nullable=True),
+    sa.Column('carbs', sa.DECIMAL(precision=10, scale=2), nullable=True),
+    sa.Column('sugar', sa.DECIMAL(precision=10, scale=2), nullable=True),
+    sa.Column('fiber', sa.DECIMAL(precision=10, scale=2), nullable=True),
+    sa.Column('sodium_mg', sa.DECIMAL(precision=10, scale=2), nullable=True),
+    sa.Column('potassium_mg', sa.DECIMAL(precision=10, scale=2), nullable=True),
+    sa.Column('calcium_mg', sa.DECIMAL(precision=10, scale=2), nullable=True),
+    sa.Column('iron_mg', sa.DECIMAL(precision=10, scale=2), nullable=True),
+    sa.Column('cholesterol_mg', sa.DECIMAL(precision=10, scale=2), nullable=True),
+    sa.Column('image_url', sa.Text(), nullable=True),
+    sa.Column('created_at', sa.DateTime(timezone=True), server_default=sa.func.now(), nullable=True),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index(op.f('ix_food_catalog_id'), 'food_catalog', ['id'], unique=False)
+    op.create_index(op.f('ix_food_catalog_name'), 'food_catalog', ['name'], unique=False)
+    op.create_table('localization_settings',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('timezone', sa.String(length=50), nullable=False),
+    sa.Column('timezone_offset', sa.String(length=10), nullable=False),
+    sa.Column('timezone_label', sa.String(length=100), nullable=False),
+    sa.Column('locale', sa.String(length=10), nullable=False),
+    sa.Column('locale_label', sa.String(length=50), nullable=False),
+    sa.Column('country_code', sa.String(length=5), nullable=False),
+    sa.Column('region', sa.String(length=50), nullable=False),
+    sa.Column('is_active', sa.Boolean(), nullable=True),
+    sa.Column('created_at', sa.DateTime(timezone=True), server_default=sa.func.now(), nullable=True),
+    sa.PrimaryKeyConstraint('id'),
+    sa.UniqueConstraint('timezone')
+    )
+    op.create_table('nutrition_info',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('name', sa.String(length=100), nullable=False),
+    sa.Column('category', sa.String(length=50), nullable=True),
+    sa.Column('unit', sa.String(length=20), nullable=True),
+    sa.Column('daily_value', sa.Integer(), nullable=True),
+    sa.Column('description', sa.Text(), nullable=True),
+    sa.Column('benefits', sa.Text(), nullable=True),
+    sa.Column('sources', sa.Text(), nullable=True),
+    sa.Column('created_at', sa.DateTime(timezone=True), server_default=sa.func.now(), nullable=True),
+    sa.PrimaryKeyConstraint('id'),
+    sa.UniqueConstraint('name')
+    )
+    op.create_index(op.f('ix_nutrition_info_id'), 'nutrition_info', ['id'], unique=False)
+    op.create_table('ocr_analysis_cache',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('content_hash', sa.String(length=64), nullable=False),
+    sa.Column('phash', sa.String(length=64), nullable=True),
+    sa.Column('language', sa.String(length=10), nullable=False),
+    sa.Column('prompt_version', sa.String(length=20), nullable=False),
+    sa.Column('result', sa.JSON(), nullable=False),
+    sa.Column('created_at', sa.DateTime(timezone=True), server_default=sa.func.now(), nullable=True),
+    sa.PrimaryKeyConstraint('id'),
+    sa.UniqueConstraint('content_hash', 'language', 'prompt_version', name='uq_analysis_content')
+    )
+    op.create_index('idx_analysis_phash', 'ocr_analysis_cache', ['phash', 'language', 'prompt_version'], unique=False)
+    op.create_index(op.f('ix_ocr_analysis_cache_id'), 'ocr_analysis_cache', ['id'], unique=False)
+    op.create_table('users',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('email', sa.String(length=255), nullable=False),
+    sa.Column('password_hash', sa.String(length=255), nullable=False),
+    sa.Column('name', sa.String(length=100), nullable=False),
+    sa.Column('role', sa.Enum('user', 'admin', name='userrole'), nullable=True),
+    sa.Column('age', sa.Integer(), nullable=True),
+    sa.Column('weight', sa.Float(), nullable=True),
+    sa.Column('height', sa.Float(), nullable=True),
+    sa.Column('gender', sa.String(length=10), nullable=True),
+    sa.Column('timezone', sa.String(length=50), nullable=True),
+    sa.Column('locale', sa.String(length=10), nullable=True),
+    sa.Column('photo_url', sa.String(length=255), nullable=True),
+    sa.Column('created_at', sa.DateTime(timezone=True), server_default=sa.func.now(), nullable=True),
+    sa.Column('updated_at', sa.DateTime(timezone=True), nullable=True),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index(op.f('ix_users_email'), 'users', ['email'], unique=True)
+    op.create_index(op.f('ix_users_id'), 'users', ['id'], unique=False)
+    op.create_table('allergens',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('name', sa.String(length=100), nullable=True),
+    sa.Column('description', sa.String(length=255), nullable=True),
+    sa.Column('created_by', sa.Integer(), nullable=True),
+    sa.Column('created_at', sa.DateTime(timezone=True), server_default=sa.func.now(), nullable=True),
+    sa.ForeignKeyConstraint(['created_by'], ['users.id'], ),
+    sa.PrimaryKeyConstraint('id'),
+    sa.UniqueConstraint('name')
+    )
+    op.create_table('owner_auth_codes',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('user_id', sa.Integer(), nullable=True),
+    sa.Column('code', sa.String(length=8), nullable=False),
+    sa.Column('created_at', sa.DateTime(timezone=True), server_default=sa.func.now(), nullable=True),
+    sa.Column('expires_at', sa.DateTime(timezone=True), nullable=False),
+    sa.Column('is_used', sa.Boolean(), nullable=True),
+    sa.ForeignKeyConstraint(['user_id'], ['users.id'], ),
+    sa.PrimaryKeyConstraint('id'),
+    sa.UniqueConstraint('code')
+    )
+    op.create_table('scan_history_bpom',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('user_id', sa.Integer(), nullable=True),
+    sa.Column('session_id', sa.String(length=100), nullable=False),
+    sa.Column('bpom_number', sa.String(length=50), nullable=False),
+    sa.Column('product_name', sa.String(length=255), nullable=True),
+    sa.Column('brand', sa.String(length=255), nullable=True),
+    sa.Column('manufacturer', sa.String(length=255), nullable=True),
+    sa.Column('status', sa.String(length=50), nullable=True),
+    sa.Column('raw_response', sa.JSON(), nullable=True),
+    sa.Column('is_favorited', sa.Boolean(), nullable=True),
+    sa.Column('created_at', sa.DateTime(timezone=True), server_default=sa.func.now(), nullable=True),
+    sa.ForeignKeyConstraint(['user_id'], ['users.id'], ),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index('idx_bpom_created', 'scan_history_bpom', ['created_at'], unique=False)
+    op.create_index('idx_bpom_favorited', 'scan_history_bpom', ['is_favorited'], unique=False)
+    op.create_index('idx_bpom_session_created', 'scan_history_bpom', ['session_id', 'created_at'], unique=False)
+    op.create_index('idx_bpom_user_created', 'scan_history_bpom', ['user_id', 'created_at'], unique=False)
+    op.create_index('idx_bpom_user_favorited', 'scan_history_bpom', ['user_id', 'is_favorited'], unique=False)
+    op.create_index('idx_bpom_user_number', 'scan_history_bpom', ['user_id', 'bpom_number'], unique=False)
+    op.create_index(op.f('ix_scan_history_bpom_id'), 'scan_history_bpom', ['id'], unique=False)
+    op.create_table('scan_history_ocr',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('user_id', sa.Integer(), nullable=True),
+    sa.Column('session_id', sa.String(length=100), nullable=False),
+    sa.Column('product_name', sa.String(length=255), nullable=True),
+    sa.Column('image_data', sa.Text(), nullable=True),
+    sa.Column('image_path', sa.String(length=255), nullable=True),
+    sa.Column('ocr_raw_data', sa.JSON(), nullable=True),
+    sa.Column('ai_analysis', sa.Text(), nullable=True),
+    sa.Column('pros', sa.JSON(), nullable=True),
+    sa.Column('cons', sa.JSON(), nullable=True),
+    sa.Column('ingredients', sa.Text(), nullable=True),
+    sa.Column('warnings', sa.JSON(), nullable=True),
+    sa.Column('health_score', sa.SmallInteger(), nullable=True),
+    sa.Column('grade', sa.String(length=2), nullable=True),
+    sa.Column('is_favorited', sa.Boolean(), nullable=True),
+    sa.Column('created_at', sa.DateTime(timezone=True), server_default=sa.func.now(), nullable=True),
+    sa.ForeignKeyConstraint(['user_id'], ['users.id'], ),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index('idx_ocr_created', 'scan_history_ocr', ['created_at'], unique=False)
+    op.create_index('idx_ocr_favorited', 'scan_history_ocr', ['is_favorited'], unique=False)
+    op.create_index('idx_ocr_session_created', 'scan_history_ocr', ['session_id', 'created_at'], unique=False)
+    op.create_index('idx_ocr_user_created', 'scan_history_ocr', ['user_id', 'created_at'], unique=False)
+    op.create_index('idx_ocr_user_favorited', 'scan_history_ocr', ['user_id', 'is_favorited'], unique=False)
+    op.create_index(op.f('ix_scan_history_ocr_id'), 'scan_history_ocr', ['id'], unique=False)
+    op.create_table('user_allergies',
+    sa.Column('user_id', sa.Integer(), nullable=True),
+    sa.Column('allergen_id', sa.Integer(), nullable=True),
+    sa.Column('created_at', sa.DateTime(timezone=True), server_default=sa.func.now(), nullable=True),
+    sa.ForeignKeyConstraint(['allergen_id'], ['allergens.id'], ),
+    sa.ForeignKeyConstraint(['user_id'], ['users.id'], )
+    )
+
+
+def downgrade():
+    op.drop_table('user_allergies')
+    op.drop_index(op.f('ix_scan_history_ocr_id'), table_name='scan_history_ocr')
+    op.drop_index('idx_ocr_user_favorited', table_name='scan_history_ocr')
+    op.drop_index('idx_ocr_user_created', table_name='scan_history_ocr')
+    op.drop_index('idx_ocr_session_created', table_name='scan_history_ocr')
+    op.drop_index('idx_ocr_favorited', table_name='scan_history_ocr')
+    op.drop_index('idx_ocr_created', table_name='scan_history_ocr')
+    op.drop_table('scan_history_ocr')
+    op.drop_index(op.f('ix_scan_history_bpom_id'), table_name='scan_history_bpom')
+    op.drop_index('idx_bpom_user_number', table_name='scan_history_bpom')
+    op.drop_index('idx_bpom_user_favorited', table_name='scan_history_bpom')
+    op.drop_index('idx_bpom_user_created', table_name='scan_history_bpom')
+    op.drop_index('idx_bpom_session_created', table_name='scan_history_bpom')
+    op.drop_index('idx_bpom_favorited', table_name='scan_history_bpom')
+    op.drop_index('idx_bpom_created', table_name='scan_history_bpom')
+    op.drop_table('scan_history_bpom')
+    op.drop_table('owner_auth_codes')
+    op.drop_table('allergens')
+    op.drop_index(op.f('ix_users_id'), table_name='users')
+    op.drop_index(op.f('ix_users_email'), table_name='users')
+    op.drop_table('users')
+    op.drop_index(op.f('ix_ocr_analysis_cache_id'), table_name='ocr_analysis_cache')
+    op.drop_index('idx_analysis_phash', table_name='ocr_analysis_cache')
+    op.drop_table('ocr_analysis_cache')
+    op.drop_index(op.f('ix_nutrition_info_id'), table_name='nutrition_info')
+    op.drop_table('nutrition_info')
+    op.drop_table('localization_settings')
+    op.drop_index(op.f('ix_food_catalog_name'), table_name='food_catalog')
+    op.drop_index(op.f('ix_food_catalog_id'), table_name='food_catalog')
+    op.drop_table('food_catalog')
+    op.drop_index(op.f('ix_education_articles_slug'), table_name='education_articles')
+    op.drop_index(op.f('ix_education_articles_id'), table_name='education_articles')
+    op.drop_table('education_articles')
+    op.drop_index(op.f('ix_diseases_id'), table_name='diseases')
+    op.drop_table('diseases')
+    op.drop_index(op.f('ix_chat_answer_cache_id'), table_name='chat_answer_cache')
+    op.drop_table('chat_answer_cache')
+    op.drop_index(op.f('ix_bpom_registry_id'), table_name='bpom_registry')
+    op.drop_index(op.f('ix_bpom_registry_bpom_key'), table_name='bpom_registry')
+    op.drop_table('bpom_registry')
+    op.drop_index(op.f('ix_bpom_negative_cache_id'), table_name='bpom_negative_cache')
+    op.drop_index(op.f('ix_bpom_negative_cache_bpom_number'), table_name='bpom_negative_cache')
+    op.drop_table('bpom_negative_cache')
+    op.drop_index(op.f('ix_bpom_cache_id'), table_name='bpom_cache')
+    op.drop_index(op.f('ix_bpom_cache_bpom_number'), table_name='bpom_cache')
+    op.drop_table('bpom_cache')
+    op.drop_index(op.f('ix_additives_id'), table_name='additives')
+    op.drop_table('additives')
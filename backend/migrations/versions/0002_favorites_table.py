@@ -0,0 +1,38 @@
+"""Tabel favorites (ada di app.models tapi tidak pernah masuk database/schema.sql).
+
+Revision ID: 0002
+Revises: 0001
+Create Date: 2026-10-18 09:00:00.000000
+
+Sebagian database sudah membuatnya manual, jadi tabel hanya dibuat bila belum ada.
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+revision = '0002'
+down_revision = '0001'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    if not op.get_context().as_sql and sa.inspect(op.get_bind()).has_table('favorites'):
+        return
+    op.create_table('favorites',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('user_id', sa.Integer(), nullable=False),
+    sa.Column('product_type', sa.Enum('bpom', 'nutrition'), nullable=False),
+    sa.Column('bpom_number', sa.String(length=100), nullable=True),
+    sa.Column('product_name', sa.String(length=255), nullable=False),
+    sa.Column('product_data', sa.Text(), nullable=True),
+    sa.Column('created_at', sa.DateTime(timezone=True), server_default=sa.func.now(), nullable=True),
+    sa.ForeignKeyConstraint(['user_id'], ['users.id'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index(op.f('ix_favorites_id'), 'favorites', ['id'], unique=False)
+
+
+def downgrade():
+    op.drop_index(op.f('ix_favorites_id'), table_name='favorites')
+    op.drop_table('favorites')
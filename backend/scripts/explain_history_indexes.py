@@ -0,0 +1,132 @@
+"""Cek EXPLAIN: query riwayat scan harus memakai index dari migrasi 007 / model.
+
+Query dibangun dengan ekspresi SQLAlchemy yang sama seperti di app/crud/scan.py dan
+app/routers/admin.py, di-compile ke dialek MySQL, lalu di-EXPLAIN di database dari .env.
+
+Jalankan dari folder backend/:
+
+    python scripts/explain_history_indexes.py
+    python scripts/explain_history_indexes.py --require-db   # CI: gagal jika MySQL tidak ada
+
+Exit code: 0 = semua sesuai (atau MySQL tidak bisa dihubungi, kecuali --require-db),
+1 = ada query yang tidak memakai index yang diharapkan / index belum dibuat,
+2 = MySQL tidak bisa dihubungi dengan --require-db.
+
+Pada tabel kecil optimizer MySQL sering memilih full scan walaupun index tersedia; karena itu
+ketidakcocokan pada tabel dengan baris < --min-rows hanya dilaporkan sebagai WARN.
+"""
+import argparse
+import os
+import sys
+from datetime import date, datetime, time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import create_engine, func, select, text
+from sqlalchemy.dialects import mysql
+from sqlalchemy.exc import OperationalError
+
+from app.core.config import settings
+from app.models import education, favorite, food, scan, user  # noqa: F401  (registrasi relationship)
+from app.models.scan import ScanHistoryBPOM, ScanHistoryOCR
+from app.services.bpom_endpoint import get_bpom_number_variants
+
+USER_ID = 1
+SESSION_ID = "explain-check"
+BPOM_NUMBER = "MD 224510107115"
+
+def _checks():
+    today_start = datetime.combine(date.today(), time.min)
+    variants = list({BPOM_NUMBER, *get_bpom_number_variants(BPOM_NUMBER)})
+    return [
+        # crud_scan.get_user_history
+        ("get_user_history (bpom)", "idx_bpom_user_created",
+         select(ScanHistoryBPOM).where(ScanHistoryBPOM.user_id == USER_ID)
+         .order_by(ScanHistoryBPOM.created_at.desc()).limit(20)),
+        ("get_user_history (ocr)", "idx_ocr_user_created",
+         select(ScanHistoryOCR).where(ScanHistoryOCR.user_id == USER_ID)
+         .order_by(ScanHistoryOCR.created_at.desc()).limit(20)),
+        # crud_scan.get_daily_ocr_scans_count
+        ("get_daily_ocr_scans_count (user)", "idx_ocr_user_created",
+         select(func.count(ScanHistoryOCR.id)).where(
+             ScanHistoryOCR.created_at >= today_start, ScanHistoryOCR.user_id == USER_ID)),
+        ("get_daily_ocr_scans_count (guest)", "idx_ocr_session_created",
+         select(func.count(ScanHistoryOCR.id)).where(
+             ScanHistoryOCR.created_at >= today_start, ScanHistoryOCR.session_id == SESSION_ID)),
+        # crud_scan.create_ocr_history: scan terakhir untuk dedup
+        ("create_ocr_history last scan (user)", "idx_ocr_user_created",
+         select(ScanHistoryOCR).where(ScanHistoryOCR.user_id == USER_ID)
+         .order_by(ScanHistoryOCR.created_at.desc()).limit(1)),
+        ("create_ocr_history last scan (guest)", "idx_ocr_session_created",
+         select(ScanHistoryOCR).where(ScanHistoryOCR.session_id == SESSION_ID)
+         .order_by(ScanHistoryOCR.created_at.desc()).limit(1)),
+        # crud_scan.create_bpom_history: dedup per nomor BPOM
+        ("create_bpom_history dedup (user)", "idx_bpom_user_number",
+         select(ScanHistoryBPOM).where(
+             ScanHistoryBPOM.user_id == USER_ID, ScanHistoryBPOM.bpom_number.in_(variants))),
+        ("create_bpom_history dedup (guest)", "idx_bpom_session_created",
+         select(ScanHistoryBPOM).where(
+             ScanHistoryBPOM.session_id == SESSION_ID, ScanHistoryBPOM.bpom_number.in_(variants))),
+        # admin /history/bpom dan /history/ocr tanpa search
+        ("admin history listing (bpom)", "idx_bpom_created",
+         select(ScanHistoryBPOM).order_by(ScanHistoryBPOM.created_at.desc()).offset(0).limit(50)),
+        ("admin history listing (ocr)", "idx_ocr_created",
+         select(ScanHistoryOCR).order_by(ScanHistoryOCR.created_at.desc()).offset(0).limit(50)),
+    ]
+
+def _compile(statement) -> str:
+    return str(statement.compile(dialect=mysql.dialect(), compile_kwargs={"literal_binds": True}))
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="EXPLAIN query riwayat scan terhadap index yang diharapkan")
+    parser.add_argument("--require-db", action="store_true", help="Exit 2 jika MySQL tidak bisa dihubungi")
+    parser.add_argument("--min-rows", type=int, default=1000,
+                        help="Di bawah jumlah baris ini, index yang tidak dipakai hanya WARN")
+    parser.add_argument("--verbose", action="store_true", help="Tampilkan SQL dan baris EXPLAIN lengkap")
+    args = parser.parse_args(argv)
+
+    engine = create_engine(settings.DATABASE_URL, connect_args={"connect_timeout": 5})
+    try:
+        conn = engine.connect()
+    except OperationalError as e:
+        print(f"SKIP: MySQL tidak bisa dihubungi ({e.orig})")
+        return 2 if args.require_db else 0
+
+    failed = 0
+    with conn:
+        indexes, rows = {}, {}
+        for table in (ScanHistoryBPOM.__tablename__, ScanHistoryOCR.__tablename__):
+            indexes[table] = {r._mapping["Key_name"] for r in conn.execute(text(f"SHOW INDEX FROM `{table}`"))}
+            rows[table] = conn.execute(text(f"SELECT COUNT(*) FROM `{table}`")).scalar_one()
+
+        for name, expected, statement in _checks():
+            table = statement.get_final_froms()[0].name
+            sql = _compile(statement)
+            plan = conn.exec_driver_sql(f"EXPLAIN {sql}").mappings().first()
+            key = plan["key"]
+
+            if expected not in indexes[table]:
+                status = "FAIL"
+                detail = f"index {expected} belum ada di {table} (jalankan migrasi 007)"
+            elif key == expected:
+                status, detail = "OK", f"key={key}"
+            elif rows[table] < args.min_rows:
+                status = "WARN"
+                detail = f"key={key}, harap {expected} ({table} hanya {rows[table]} baris)"
+            else:
+                status, detail = "FAIL", f"key={key}, harap {expected}"
+
+            if status == "FAIL":
+                failed += 1
+            print(f"{status:<4}  {name:<38} {detail}")
+            if args.verbose:
+                print(f"      {sql}")
+                print(f"      {dict(plan)}")
+
+    if failed:
+        print(f"{failed} query tidak memakai index yang diharapkan")
+        return 1
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
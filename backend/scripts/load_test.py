@@ -0,0 +1,136 @@
+"""Load test sederhana untuk endpoint scan BPOM dan riwayat user.
+
+Dipakai untuk membandingkan throughput sebelum/sesudah perubahan (mis. port route scan ke
+AsyncSession): jalankan server dengan konfigurasi yang sama (1 worker uvicorn) di kedua
+versi, lalu jalankan script ini dengan argumen yang sama.
+
+Contoh (dari folder backend/):
+
+    python scripts/load_test.py bpom --bpom-number MD224510107115 --concurrency 1 10 50
+    python scripts/load_test.py history --token <JWT> --requests 500 --concurrency 10 50
+
+Catatan:
+- /api/scan/bpom memerlukan header X-Recaptcha-Token; nilainya bebas selama
+  RECAPTCHA_SECRET_KEY server kosong (mode dev).
+- Gunakan nomor BPOM yang sudah ada di bpom_cache/registry agar yang diukur adalah jalur
+  database, bukan scraper BPOM (yang dibatasi jaringan dan rate limit upstream).
+- Setiap request bpom yang berhasil menulis satu baris scan_history_bpom.
+"""
+import argparse
+import asyncio
+import statistics
+import sys
+import time
+import uuid
+from collections import Counter
+from typing import List, Optional
+
+import httpx
+
+def _percentile(values: List[float], pct: float) -> float:
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, round(pct / 100 * len(ordered)) - 1))
+    return ordered[index]
+
+def _build_request(args, i: int):
+    if args.endpoint == "bpom":
+        number = args.bpom_number[i % len(args.bpom_number)]
+        headers = {
+            "X-Recaptcha-Token": args.recaptcha_token,
+            # Session berbeda per request agar tidak terkena kuota/dedup per session
+            "X-Session-Id": f"loadtest-{uuid.uuid4().hex}",
+        }
+        if args.token:
+            headers["Authorization"] = f"Bearer {args.token}"
+        return "POST", "/api/scan/bpom", {"bpom_number": number}, headers
+
+    return "GET", "/api/users/history", None, {"Authorization": f"Bearer {args.token}"}
+
+async def run_level(args, concurrency: int) -> dict:
+    latencies: List[float] = []
+    statuses: Counter = Counter()
+    counter = iter(range(args.requests))
+
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+    async with httpx.AsyncClient(base_url=args.base_url, timeout=args.timeout, limits=limits) as client:
+
+        async def worker():
+            for i in counter:
+                method, path, body, headers = _build_request(args, i)
+                started = time.perf_counter()
+                try:
+                    response = await client.request(method, path, json=body, headers=headers)
+                    statuses[response.status_code] += 1
+                except httpx.HTTPError as e:
+                    statuses[type(e).__name__] += 1
+                    continue
+                latencies.append(time.perf_counter() - started)
+
+        started = time.perf_counter()
+        await asyncio.gather(*(worker() for _ in range(concurrency)))
+        elapsed = time.perf_counter() - started
+
+    ok = sum(count for status, count in statuses.items() if status == 200)
+    return {
+        "concurrency": concurrency,
+        "requests": args.requests,
+        "ok": ok,
+        "errors": args.requests - ok,
+        "statuses": dict(statuses),
+        "elapsed_s": elapsed,
+        "rps": ok / elapsed if elapsed else 0.0,
+        "p50_ms": _percentile(latencies, 50) * 1000,
+        "p95_ms": _percentile(latencies, 95) * 1000,
+        "p99_ms": _percentile(latencies, 99) * 1000,
+        "mean_ms": statistics.fmean(latencies) * 1000 if latencies else 0.0,
+    }
+
+def print_report(results: List[dict]):
+    header = f"{'conc':>5} {'ok':>7} {'err':>5} {'req/s':>9} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} {'mean ms':>9}"
+    print(header)
+    print("-" * len(header))
+    for r in results:
+        print(
+            f"{r['concurrency']:>5} {r['ok']:>7} {r['errors']:>5} {r['rps']:>9.1f} "
+            f"{r['p50_ms']:>9.1f} {r['p95_ms']:>9.1f} {r['p99_ms']:>9.1f} {r['mean_ms']:>9.1f}"
+        )
+    for r in results:
+        other = {status: count for status, count in r["statuses"].items() if status != 200}
+        if other:
+            print(f"conc={r['concurrency']}: status selain 200 -> {other}")
+
+async def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Load test /api/scan/bpom dan /api/users/history")
+    parser.add_argument("endpoint", choices=["bpom", "history"])
+    parser.add_argument("--base-url", default="http://localhost:8000")
+    parser.add_argument("--requests", type=int, default=200, help="Jumlah request per level concurrency")
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 10, 50])
+    parser.add_argument("--bpom-number", action="append", help="Boleh diulang; dipakai bergiliran")
+    parser.add_argument("--token", help="JWT Bearer (wajib untuk history, opsional untuk bpom)")
+    parser.add_argument("--recaptcha-token", default="loadtest")
+    parser.add_argument("--timeout", type=float, default=30.0)
+    parser.add_argument("--warmup", type=int, default=5, help="Request pemanasan sebelum pengukuran")
+    args = parser.parse_args(argv)
+
+    if args.endpoint == "bpom" and not args.bpom_number:
+        parser.error("--bpom-number wajib untuk endpoint bpom")
+    if args.endpoint == "history" and not args.token:
+        parser.error("--token wajib untuk endpoint history")
+
+    if args.warmup:
+        warmup = argparse.Namespace(**{**vars(args), "requests": args.warmup})
+        result = await run_level(warmup, 1)
+        if result["ok"] == 0:
+            print(f"Pemanasan gagal, cek server/argumen: {result['statuses']}", file=sys.stderr)
+            return 1
+
+    results = []
+    for concurrency in args.concurrency:
+        results.append(await run_level(args, concurrency))
+    print_report(results)
+    return 0 if all(r["errors"] == 0 for r in results) else 1
+
+if __name__ == "__main__":
+    sys.exit(asyncio.run(main()))
@@ -0,0 +1,10 @@
+-- Negative cache untuk nomor BPOM yang tidak dikenal cekbpom
+-- Kunci: nomor BPOM ternormalisasi (huruf besar, tanpa spasi/tanda baca)
+
+CREATE TABLE IF NOT EXISTS `bpom_negative_cache` (
+  `id` int(11) NOT NULL AUTO_INCREMENT,
+  `bpom_number` varchar(50) NOT NULL,
+  `last_checked` timestamp NULL DEFAULT current_timestamp() ON UPDATE current_timestamp(),
+  PRIMARY KEY (`id`),
+  UNIQUE KEY `bpom_number` (`bpom_number`)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci;
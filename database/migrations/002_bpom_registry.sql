@@ -0,0 +1,21 @@
+-- Snapshot lokal registry produk BPOM (diisi lewat app.services.bpom_registry)
+-- bpom_key: nomor BPOM ternormalisasi, dipakai untuk lookup
+
+CREATE TABLE IF NOT EXISTS `bpom_registry` (
+  `id` int(11) NOT NULL AUTO_INCREMENT,
+  `bpom_key` varchar(50) NOT NULL,
+  `bpom_number` varchar(50) NOT NULL,
+  `product_name` varchar(255) DEFAULT NULL,
+  `brand` varchar(255) DEFAULT NULL,
+  `manufacturer` varchar(255) DEFAULT NULL,
+  `address` text DEFAULT NULL,
+  `issued_date` varchar(50) DEFAULT NULL,
+  `expired_date` varchar(50) DEFAULT NULL,
+  `composition` text DEFAULT NULL,
+  `packaging` varchar(255) DEFAULT NULL,
+  `status` varchar(50) DEFAULT NULL,
+  `qr_code` varchar(255) DEFAULT NULL,
+  `imported_at` timestamp NULL DEFAULT current_timestamp() ON UPDATE current_timestamp(),
+  PRIMARY KEY (`id`),
+  UNIQUE KEY `bpom_key` (`bpom_key`)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci;
@@ -0,0 +1,27 @@
+-- bpom_cache.bpom_number menjadi kunci kanonik (huruf besar, tanpa spasi/tanda baca)
+-- sehingga "MD123", "md 123" dan "MD-123" berbagi satu baris cache.
+-- Butuh MariaDB >= 10.2 / MySQL >= 8.0 (REGEXP_REPLACE + window function).
+
+START TRANSACTION;
+
+-- 1. Gabungkan duplikat: simpan baris paling baru per kunci kanonik
+DELETE FROM `bpom_cache`
+WHERE `id` IN (
+  SELECT `id` FROM (
+    SELECT `id`,
+           ROW_NUMBER() OVER (
+             PARTITION BY REGEXP_REPLACE(UPPER(`bpom_number`), '[^A-Z0-9]', '')
+             ORDER BY `last_updated` DESC, `id` DESC
+           ) AS `rn`
+    FROM `bpom_cache`
+  ) AS `ranked`
+  WHERE `rn` > 1
+);
+
+-- 2. Tulis ulang kunci ke bentuk kanonik (last_updated dipertahankan)
+UPDATE `bpom_cache`
+SET `bpom_number` = REGEXP_REPLACE(UPPER(`bpom_number`), '[^A-Z0-9]', ''),
+    `last_updated` = `last_updated`
+WHERE `bpom_number` <> REGEXP_REPLACE(UPPER(`bpom_number`), '[^A-Z0-9]', '');
+
+COMMIT;
@@ -0,0 +1,15 @@
+-- Cache hasil analisis AI label gizi, content-addressed
+-- content_hash: sha256 byte gambar; phash: dHash 256-bit thumbnail grayscale
+
+CREATE TABLE IF NOT EXISTS `ocr_analysis_cache` (
+  `id` int(11) NOT NULL AUTO_INCREMENT,
+  `content_hash` varchar(64) NOT NULL,
+  `phash` varchar(64) DEFAULT NULL,
+  `language` varchar(10) NOT NULL,
+  `prompt_version` varchar(20) NOT NULL,
+  `result` longtext CHARACTER SET utf8mb4 COLLATE utf8mb4_bin NOT NULL CHECK (json_valid(`result`)),
+  `created_at` timestamp NULL DEFAULT current_timestamp(),
+  PRIMARY KEY (`id`),
+  UNIQUE KEY `uq_analysis_content` (`content_hash`,`language`,`prompt_version`),
+  KEY `idx_analysis_phash` (`phash`,`language`,`prompt_version`)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci;
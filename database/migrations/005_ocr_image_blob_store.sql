@@ -0,0 +1,7 @@
+-- Gambar scan OCR dipindah dari kolom image_data (base64) ke blob store di uploads/scans.
+-- Setelah kolom ditambahkan, pindahkan data lama dari folder backend:
+--     python -m app.services.blob_store --batch-size 200
+-- image_data dibiarkan untuk baris yang gagal dimigrasi; baris yang berhasil di-set NULL.
+
+ALTER TABLE `scan_history_ocr`
+  ADD COLUMN `image_path` varchar(255) DEFAULT NULL AFTER `image_data`;
@@ -0,0 +1,12 @@
+-- Tier DB cache jawaban /api/scan/chat (opsional, CHAT_CACHE_DB_ENABLED)
+-- cache_key: sha256 dari konteks produk kanonik + pertanyaan ternormalisasi + bahasa + versi prompt
+
+CREATE TABLE IF NOT EXISTS `chat_answer_cache` (
+  `id` int(11) NOT NULL AUTO_INCREMENT,
+  `cache_key` varchar(64) NOT NULL,
+  `language` varchar(10) NOT NULL,
+  `answer` text NOT NULL,
+  `created_at` timestamp NULL DEFAULT current_timestamp(),
+  PRIMARY KEY (`id`),
+  UNIQUE KEY `cache_key` (`cache_key`)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci;
@@ -0,0 +1,22 @@
+-- Index komposit untuk query riwayat scan:
+--   (user_id, created_at)    riwayat user, kuota harian OCR, history terakhir
+--   (session_id, created_at) hal yang sama untuk guest (tanpa user_id)
+--   (user_id, bpom_number)   dedup riwayat BPOM per user
+--   (created_at)             listing admin dan kandidat refresh cache BPOM
+-- idx_is_favorited_* identik dengan idx_*_user_favorited, jadi dihapus.
+-- ALGORITHM=INPLACE, LOCK=NONE: tabel tetap bisa dibaca/ditulis selama index dibangun.
+
+ALTER TABLE `scan_history_bpom`
+  DROP KEY `idx_is_favorited_bpom`,
+  ADD KEY `idx_bpom_user_created` (`user_id`,`created_at`),
+  ADD KEY `idx_bpom_session_created` (`session_id`,`created_at`),
+  ADD KEY `idx_bpom_user_number` (`user_id`,`bpom_number`),
+  ADD KEY `idx_bpom_created` (`created_at`),
+  ALGORITHM=INPLACE, LOCK=NONE;
+
+ALTER TABLE `scan_history_ocr`
+  DROP KEY `idx_is_favorited_ocr`,
+  ADD KEY `idx_ocr_user_created` (`user_id`,`created_at`),
+  ADD KEY `idx_ocr_session_created` (`session_id`,`created_at`),
+  ADD KEY `idx_ocr_created` (`created_at`),
+  ALGORITHM=INPLACE, LOCK=NONE;
@@ -67,6 +67,55 @@ CREATE TABLE `bpom_cache` (
 
 -- --------------------------------------------------------
 
+--
+-- Table structure for table `bpom_negative_cache`
+--
+
+CREATE TABLE `bpom_negative_cache` (
+  `id` int(11) NOT NULL,
+  `bpom_number` varchar(50) NOT NULL,
+  `last_checked` timestamp NULL DEFAULT current_timestamp() ON UPDATE current_timestamp()
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci;
+
+-- --------------------------------------------------------
+
+--
+-- Table structure for table `bpom_registry`
+--
+
+CREATE TABLE `bpom_registry` (
+  `id` int(11) NOT NULL,
+  `bpom_key` varchar(50) NOT NULL,
+  `bpom_number` varchar(50) NOT NULL,
+  `product_name` varchar(255) DEFAULT NULL,
+  `brand` varchar(255) DEFAULT NULL,
+  `manufacturer` varchar(255) DEFAULT NULL,
+  `address` text DEFAULT NULL,
+  `issued_date` varchar(50) DEFAULT NULL,
+  `expired_date` varchar(50) DEFAULT NULL,
+  `composition` text DEFAULT NULL,
+  `packaging` varchar(255) DEFAULT NULL,
+  `status` varchar(50) DEFAULT NULL,
+  `qr_code` varchar(255) DEFAULT NULL,
+  `imported_at` timestamp NULL DEFAULT current_timestamp() ON UPDATE current_timestamp()
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci;
+
+-- --------------------------------------------------------
+
+--
+-- Table structure for table `chat_answer_cache`
+--
+
+CREATE TABLE `chat_answer_cache` (
+  `id` int(11) NOT NULL,
+  `cache_key` varchar(64) NOT NULL COMMENT 'sha256(konteks kanonik + pertanyaan ternormalisasi + bahasa + versi prompt)',
+  `language` varchar(10) NOT NULL,
+  `answer` text NOT NULL,
+  `created_at` timestamp NULL DEFAULT current_timestamp()
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci;
+
+-- --------------------------------------------------------
+
 --
 -- Table structure for table `diseases`
 --
@@ -181,6 +230,22 @@ CREATE TABLE `owner_auth_codes` (
 
 -- --------------------------------------------------------
 
+--
+-- Table structure for table `ocr_analysis_cache`
+--
+
+CREATE TABLE `ocr_analysis_cache` (
+  `id` int(11) NOT NULL,
+  `content_hash` varchar(64) NOT NULL,
+  `phash` varchar(64) DEFAULT NULL,
+  `language` varchar(10) NOT NULL,
+  `prompt_version` varchar(20) NOT NULL,
+  `result` longtext CHARACTER SET utf8mb4 COLLATE utf8mb4_bin NOT NULL CHECK (json_valid(`result`)),
+  `created_at` timestamp NULL DEFAULT current_timestamp()
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci;
+
+-- --------------------------------------------------------
+
 --
 -- Table structure for table `scan_history_bpom`
 --
@@ -211,6 +276,7 @@ CREATE TABLE `scan_history_ocr` (
   `session_id` varchar(100) NOT NULL,
   `product_name` varchar(255) DEFAULT NULL,
   `image_data` longtext DEFAULT NULL,
+  `image_path` varchar(255) DEFAULT NULL COMMENT 'Path relatif di blob store (uploads/)',
   `ocr_raw_data` longtext CHARACTER SET utf8mb4 COLLATE utf8mb4_bin DEFAULT NULL COMMENT 'Hasil OCR: kalori, lemak, gula, protein, dll' CHECK (json_valid(`ocr_raw_data`)),
   `ai_analysis` text DEFAULT NULL COMMENT 'Output analisis Gemini AI',
   `pros` longtext CHARACTER SET utf8mb4 COLLATE utf8mb4_bin DEFAULT NULL CHECK (json_valid(`pros`)),
@@ -284,6 +350,27 @@ ALTER TABLE `bpom_cache`
   ADD PRIMARY KEY (`id`),
   ADD UNIQUE KEY `bpom_number` (`bpom_number`);
 
+--
+-- Indexes for table `bpom_negative_cache`
+--
+ALTER TABLE `bpom_negative_cache`
+  ADD PRIMARY KEY (`id`),
+  ADD UNIQUE KEY `bpom_number` (`bpom_number`);
+
+--
+-- Indexes for table `bpom_registry`
+--
+ALTER TABLE `bpom_registry`
+  ADD PRIMARY KEY (`id`),
+  ADD UNIQUE KEY `bpom_key` (`bpom_key`);
+
+--
+-- Indexes for table `chat_answer_cache`
+--
+ALTER TABLE `chat_answer_cache`
+  ADD PRIMARY KEY (`id`),
+  ADD UNIQUE KEY `cache_key` (`cache_key`);
+
 --
 -- Indexes for table `diseases`
 --
@@ -327,23 +414,36 @@ ALTER TABLE `owner_auth_codes`
   ADD UNIQUE KEY `code` (`code`),
   ADD KEY `user_id` (`user_id`);
 
+--
+-- Indexes for table `ocr_analysis_cache`
+--
+ALTER TABLE `ocr_analysis_cache`
+  ADD PRIMARY KEY (`id`),
+  ADD UNIQUE KEY `uq_analysis_content` (`content_hash`,`language`,`prompt_version`),
+  ADD KEY `idx_analysis_phash` (`phash`,`language`,`prompt_version`);
+
 --
 -- Indexes for table `scan_history_bpom`
 --
 ALTER TABLE `scan_history_bpom`
   ADD PRIMARY KEY (`id`),
-  ADD KEY `idx_is_favorited_bpom` (`user_id`,`is_favorited`),
   ADD KEY `idx_bpom_favorited` (`is_favorited`),
-  ADD KEY `idx_bpom_user_favorited` (`user_id`,`is_favorited`);
+  ADD KEY `idx_bpom_user_favorited` (`user_id`,`is_favorited`),
+  ADD KEY `idx_bpom_user_created` (`user_id`,`created_at`),
+  ADD KEY `idx_bpom_session_created` (`session_id`,`created_at`),
+  ADD KEY `idx_bpom_user_number` (`user_id`,`bpom_number`),
+  ADD KEY `idx_bpom_created` (`created_at`);
 
 --
 -- Indexes for table `scan_history_ocr`
 --
 ALTER TABLE `scan_history_ocr`
   ADD PRIMARY KEY (`id`),
-  ADD KEY `idx_is_favorited_ocr` (`user_id`,`is_favorited`),
   ADD KEY `idx_ocr_favorited` (`is_favorited`),
-  ADD KEY `idx_ocr_user_favorited` (`user_id`,`is_favorited`);
+  ADD KEY `idx_ocr_user_favorited` (`user_id`,`is_favorited`),
+  ADD KEY `idx_ocr_user_created` (`user_id`,`created_at`),
+  ADD KEY `idx_ocr_session_created` (`session_id`,`created_at`),
+  ADD KEY `idx_ocr_created` (`created_at`);
 
 --
 -- Indexes for table `users`
@@ -382,6 +482,24 @@ ALTER TABLE `allergens`
 ALTER TABLE `bpom_cache`
   MODIFY `id` int(11) NOT NULL AUTO_INCREMENT;
 
+--
+-- AUTO_INCREMENT for table `bpom_negative_cache`
+--
+ALTER TABLE `bpom_negative_cache`
+  MODIFY `id` int(11) NOT NULL AUTO_INCREMENT;
+
+--
+-- AUTO_INCREMENT for table `bpom_registry`
+--
+ALTER TABLE `bpom_registry`
+  MODIFY `id` int(11) NOT NULL AUTO_INCREMENT;
+
+--
+-- AUTO_INCREMENT for table `chat_answer_cache`
+--
+ALTER TABLE `chat_answer_cache`
+  MODIFY `id` int(11) NOT NULL AUTO_INCREMENT;
+
 --
 -- AUTO_INCREMENT for table `diseases`
 --
@@ -418,6 +536,12 @@ ALTER TABLE `nutrition_info`
 ALTER TABLE `owner_auth_codes`
   MODIFY `id` int(11) NOT NULL AUTO_INCREMENT;
 
+--
+-- AUTO_INCREMENT for table `ocr_analysis_cache`
+--
+ALTER TABLE `ocr_analysis_cache`
+  MODIFY `id` int(11) NOT NULL AUTO_INCREMENT;
+
 --
 -- AUTO_INCREMENT for table `scan_history_bpom`
 --
@@ -13,6 +13,15 @@ import AnimatedStatus from "../components/ui/AnimatedStatus";
 import api from "../config/api";
 import { useTranslation } from "react-i18next";
 
+// image_url dari API berupa path relatif (/api/uploads/...) atau data URI untuk scan lama
+const getImageUrl = (path) => {
+  if (!path) return null;
+  if (path.startsWith("http") || path.startsWith("data:")) return path;
+
+  const baseUrl = import.meta.env.VITE_API_URL.replace("/api", "");
+  return `${baseUrl}${path}`;
+};
+
 const HistoryDetail = () => {
   const { t, i18n } = useTranslation();
   const { id, type } = useParams();
@@ -290,7 +299,7 @@ const HistoryDetail = () => {
                 </Button>
                 {showImage && (
                   <img
-                    src={data.image_data}
+                    src={getImageUrl(data.image_url)}
                     alt="Scanned"
                     className="w-full rounded-lg mt-3"
                   />